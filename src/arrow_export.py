@@ -0,0 +1,94 @@
+"""
+Columnar export of the DrugBank name and alias table, for analytics tools (pandas, DuckDB,
+Polars) that should not have to unpickle the maps or re-parse the XML.
+
+One row per drug name or alias:
+    drugbank_id       dictionary<string>
+    name              dictionary<string>   primary name of the drug
+    alias             string               the name or alias itself
+    alias_type        dictionary<string>   "name", "synonym", "international-brand", "product" or "mixture"
+    normalized_name   string               normalize.normalize_drug_name(alias)
+    groups            list<dictionary<string>>   e.g. ["approved", "investigational"]
+    atc_codes         list<string>
+
+Written as Parquet (compact, for storage and DuckDB/Polars scans) or as an Arrow IPC file
+(memory-mapped and read zero-copy with pyarrow.ipc.open_file / pyarrow.memory_map).
+"""
+
+from typing import Dict, Iterable
+from normalize import normalize_drug_name
+
+# pyarrow is only needed for the columnar export
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+PARQUET_EXTENSION = '.parquet'
+ARROW_EXTENSION = '.arrow'
+
+def build_drug_table(drug_records: Iterable[Dict]) -> "pa.Table":
+    """
+    Build the name and alias table.
+
+    Args:
+        drug_records (iterable): Drug fields as returned by generate_map.extract_drug_fields
+
+    Returns:
+        pa.Table: One row per primary name and alias of each drug
+    """
+    if not PYARROW_AVAILABLE:
+        raise ImportError("pyarrow is required for the columnar export, install it with `pixi add pyarrow`")
+    columns = {field: [] for field in ('drugbank_id', 'name', 'alias', 'alias_type', 'normalized_name',
+                                       'groups', 'atc_codes')}
+    for record in drug_records:
+        groups = record.get('groups', [])
+        atc_codes = record.get('atc_codes', [])
+        for alias, alias_type in [(record['name'], 'name')] + record['aliases']:
+            columns['drugbank_id'].append(record['drugbank_id'])
+            columns['name'].append(record['name'])
+            columns['alias'].append(alias)
+            columns['alias_type'].append(alias_type)
+            columns['normalized_name'].append(normalize_drug_name(alias))
+            columns['groups'].append(groups)
+            columns['atc_codes'].append(atc_codes)
+
+    dictionary_string = pa.dictionary(pa.int32(), pa.string())
+    schema = pa.schema([
+        ('drugbank_id', dictionary_string),
+        ('name', dictionary_string),
+        ('alias', pa.string()),
+        ('alias_type', dictionary_string),
+        ('normalized_name', pa.string()),
+        ('groups', pa.list_(dictionary_string)),
+        ('atc_codes', pa.list_(pa.string())),
+    ])
+    arrays = []
+    for field in schema:
+        values = columns[field.name]
+        if field.type == dictionary_string:
+            arrays.append(pa.array(values, pa.string()).dictionary_encode())
+        elif field.type == pa.list_(dictionary_string):
+            lists = pa.array(values, pa.list_(pa.string()))
+            arrays.append(pa.ListArray.from_arrays(lists.offsets, lists.flatten().dictionary_encode()))
+        else:
+            arrays.append(pa.array(values, field.type))
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+def write_drug_table(table: "pa.Table", filepath: str):
+    """
+    Write the table as Parquet or as an Arrow IPC file, depending on the extension of filepath.
+
+    Args:
+        table (pa.Table): Table returned by build_drug_table
+        filepath (str): Path ending in .parquet or .arrow
+    """
+    if filepath.endswith(PARQUET_EXTENSION):
+        pq.write_table(table, filepath, compression='zstd')
+    elif filepath.endswith(ARROW_EXTENSION):
+        with pa.OSFile(filepath, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    else:
+        raise ValueError(f"Unsupported table format for {filepath}, use {PARQUET_EXTENSION} or {ARROW_EXTENSION}")
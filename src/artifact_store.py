@@ -0,0 +1,178 @@
+"""
+Content-addressed store for the outputs of generate_map.
+
+Each artifact is saved as <name>-<sha256 prefix><extension> and recorded in manifest.json
+together with the DrugBank release it was built from. The manifest keeps a pointer to the
+latest artifact of each name (and of each name per release), so loaders find a file with one
+dictionary lookup instead of listing the directory and comparing creation times.
+
+Artifacts and the manifest are written to temporary files and renamed into place, so a reader
+never sees a half-written file, and an artifact only becomes "latest" once it is complete.
+"""
+
+import fcntl
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional
+from loguru import logger
+
+MANIFEST_FILENAME = 'manifest.json'
+MANIFEST_VERSION = 1
+HASH_PREFIX_LENGTH = 16
+
+def _artifact_key(name: str, extension: str) -> str:
+    return f"{name}{extension}"
+
+class ArtifactStore:
+    """
+    Versioned outputs in a directory, indexed by manifest.json:
+
+        {"version": 1,
+         "artifacts": {filename: {"name", "extension", "sha256", "size", "release", "created"}},
+         "latest": {name + extension: filename},
+         "releases": {release: {name + extension: filename}}}
+    """
+
+    def __init__(self, directory: str):
+        """
+        Args:
+            directory (str): Directory the artifacts and manifest live in. Created on first write.
+        """
+        self.directory = directory
+        self.manifest_path = os.path.join(directory, MANIFEST_FILENAME)
+
+    def load_manifest(self) -> Dict:
+        """Read the manifest, or an empty one if nothing was saved yet."""
+        try:
+            with open(self.manifest_path, 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"version": MANIFEST_VERSION, "artifacts": {}, "latest": {}, "releases": {}}
+
+    @contextmanager
+    def _locked_manifest(self):
+        """
+        Hold an exclusive lock on the manifest while it is read, updated and rewritten, so
+        concurrent builds do not drop each other's entries.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        with open(f"{self.manifest_path}.lock", 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                manifest = self.load_manifest()
+                yield manifest
+                self._write_atomic(self.manifest_path,
+                                   lambda path: _write_json(manifest, path))
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _write_atomic(self, filepath: str, write: Callable[[str], None]):
+        """Write a file through write(tmp_path) and rename it to filepath once complete."""
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix='.tmp-')
+        os.close(fd)
+        try:
+            write(tmp_path)
+            os.replace(tmp_path, filepath)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def put(self, name: str, extension: str, write: Callable[[str], None], release: Optional[str] = None) -> str:
+        """
+        Save an artifact and make it the latest one of its name.
+
+        Args:
+            name (str): Artifact name, e.g. "drugbank_name_to_id"
+            extension (str): File extension, e.g. ".pkl"
+            write (callable): Writes the artifact to the path it is given
+            release (str, optional): DrugBank release the artifact was built from
+
+        Returns:
+            str: Path of the saved artifact. Saving identical contents again reuses the existing file.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix='.tmp-', suffix=extension)
+        os.close(fd)
+        try:
+            write(tmp_path)
+            os.chmod(tmp_path, 0o644)
+            sha256 = file_sha256(tmp_path)
+            filename = f"{name}-{sha256[:HASH_PREFIX_LENGTH]}{extension}"
+            filepath = os.path.join(self.directory, filename)
+            size = os.path.getsize(tmp_path)
+            if os.path.exists(filepath):
+                os.remove(tmp_path)
+            else:
+                os.replace(tmp_path, filepath)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        key = _artifact_key(name, extension)
+        with self._locked_manifest() as manifest:
+            manifest["artifacts"][filename] = {
+                "name": name,
+                "extension": extension,
+                "sha256": sha256,
+                "size": size,
+                "release": release,
+                "created": time.time(),
+            }
+            manifest["latest"][key] = filename
+            if release is not None:
+                manifest["releases"].setdefault(release, {})[key] = filename
+        logger.info(f"Saved {name} ({release or 'unknown release'}) to {filepath}")
+        return filepath
+
+    def put_pickle(self, name: str, data: Any, release: Optional[str] = None) -> str:
+        """Pickle data and save it as an artifact, see put."""
+        def write(path):
+            with open(path, 'wb') as f:
+                pickle.dump(data, f)
+        return self.put(name, '.pkl', write, release)
+
+    def put_json(self, name: str, data: Any, release: Optional[str] = None) -> str:
+        """Save data as a JSON artifact, see put."""
+        return self.put(name, '.json', lambda path: _write_json(data, path), release)
+
+    def resolve(self, name: str, extension: str = '.pkl', release: Optional[str] = None) -> Optional[str]:
+        """
+        Get the path of the latest artifact of a name.
+
+        Args:
+            name (str): Artifact name
+            extension (str): File extension
+            release (str, optional): Only consider artifacts built from this DrugBank release
+
+        Returns:
+            str: Path of the artifact, or None if the store has none
+        """
+        manifest = self.load_manifest()
+        pointers = manifest["latest"] if release is None else manifest["releases"].get(release, {})
+        filename = pointers.get(_artifact_key(name, extension))
+        if filename is None:
+            return None
+        return os.path.join(self.directory, filename)
+
+def _write_json(data: Any, path: str):
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2)
+
+def file_sha256(filepath: str) -> str:
+    """Hash a file's contents."""
+    digest = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def open_store(src_dir: str) -> ArtifactStore:
+    """Get the store in the saved_outputs directory under src_dir."""
+    return ArtifactStore(os.path.join(src_dir, 'saved_outputs'))
@@ -0,0 +1,116 @@
+"""
+Batch drug name matching sharded across a pool of worker processes.
+"""
+
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator, List, Tuple, Optional, Sequence
+from tqdm import tqdm
+from loguru import logger
+from fuzzy_search import DrugMatcher, load_drug_name_map, load_alias_index
+
+# Matcher owned by each worker process, built once by _init_worker
+_worker_matcher: Optional[DrugMatcher] = None
+
+def _load_matcher(filepath: Optional[str], alias_filepath: Optional[str]) -> DrugMatcher:
+    """Load the drug map (and the alias index, if a path is given) and build a matcher."""
+    alias_index = load_alias_index(alias_filepath) if alias_filepath is not None else None
+    return DrugMatcher(load_drug_name_map(filepath), alias_index=alias_index)
+
+def _init_worker(filepath: Optional[str], alias_filepath: Optional[str]):
+    """Load the drug map and build the matcher once per worker process."""
+    global _worker_matcher
+    _worker_matcher = _load_matcher(filepath, alias_filepath)
+
+def _match_chunk(queries: Sequence[str],
+                 method: str,
+                 threshold: float,
+                 max_results: int) -> List[List[Tuple[str, str, float]]]:
+    """Match one shard of queries with the worker's matcher."""
+    return _worker_matcher.search_many(queries, method, threshold, max_results)
+
+def parallel_search_many(queries: Sequence[str],
+                         filepath: Optional[str] = None,
+                         method: str = "fuzzywuzzy",
+                         threshold: float = 70.0,
+                         max_results: int = 5,
+                         n_workers: Optional[int] = None,
+                         chunk_size: Optional[int] = None,
+                         alias_filepath: Optional[str] = None) -> List[List[Tuple[str, str, float]]]:
+    """
+    Search for many drug names in parallel. The queries are split into chunks that are
+    matched by a pool of worker processes, each of which loads the drug map once.
+
+    Args:
+        queries (sequence): The drug names to search for
+        filepath (str, optional): Path to the drug map pickle file. If None, each worker loads
+                                  the most recent one (see load_drug_name_map).
+        method (str): The matching method to use
+        threshold (float): Minimum similarity score (0-100) for matches
+        max_results (int): Maximum number of results to return per query
+        n_workers (int, optional): Number of worker processes. Defaults to the number of CPUs.
+                                   With 1 worker, queries are matched in the current process.
+        chunk_size (int, optional): Number of queries per chunk. Defaults to an even split into
+                                    4 chunks per worker.
+        alias_filepath (str, optional): Path to an alias index pickle file. If given, exact alias
+                                        hits are answered without fuzzy scoring.
+
+    Returns:
+        list: One list of (drug_name, drugbank_id, similarity_score) tuples per query, in input order
+    """
+    queries = list(queries)
+    if n_workers is None:
+        n_workers = os.cpu_count() or 1
+    if n_workers <= 1 or len(queries) <= 1:
+        matcher = _load_matcher(filepath, alias_filepath)
+        return matcher.search_many(tqdm(queries), method, threshold, max_results)
+
+    if chunk_size is None:
+        chunk_size = max(1, -(-len(queries) // (n_workers * 4)))
+    chunks = [queries[i:i + chunk_size] for i in range(0, len(queries), chunk_size)]
+    logger.info(f"Matching {len(queries)} queries in {len(chunks)} chunks with {n_workers} workers")
+
+    results = []
+    for chunk_results in tqdm(iter_search_chunks(chunks, filepath, method, threshold, max_results,
+                                                 n_workers, alias_filepath), total=len(chunks)):
+        results.extend(chunk_results)
+    return results
+
+def iter_search_chunks(chunks: Iterable[Sequence[str]],
+                       filepath: Optional[str] = None,
+                       method: str = "fuzzywuzzy",
+                       threshold: float = 70.0,
+                       max_results: int = 5,
+                       n_workers: Optional[int] = None,
+                       alias_filepath: Optional[str] = None) -> Iterator[List[List[Tuple[str, str, float]]]]:
+    """
+    Match a stream of query chunks with a pool of worker processes, yielding each chunk's results
+    in input order. Only a bounded number of chunks is in flight at once, so arbitrarily long
+    streams are matched in constant memory.
+
+    Args:
+        chunks (iterable): Lists of drug names to search for. Consumed lazily.
+        filepath (str, optional): Path to the drug map file. If None, each worker loads the most recent one.
+        method (str): The matching method to use
+        threshold (float): Minimum similarity score (0-100) for matches
+        max_results (int): Maximum number of results to return per query
+        n_workers (int, optional): Number of worker processes. Defaults to the number of CPUs.
+        alias_filepath (str, optional): Path to an alias index pickle file
+
+    Yields:
+        list: For each chunk, one list of (drug_name, drugbank_id, similarity_score) tuples per query
+    """
+    if n_workers is None:
+        n_workers = os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=n_workers,
+                             initializer=_init_worker,
+                             initargs=(filepath, alias_filepath)) as executor:
+        # Futures are consumed in submission order, so the output is deterministic
+        pending = deque()
+        for chunk in chunks:
+            pending.append(executor.submit(_match_chunk, list(chunk), method, threshold, max_results))
+            if len(pending) >= 2 * n_workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
@@ -0,0 +1,245 @@
+"""
+Reproducible benchmark of the fuzzy_search_drug methods over synthetic drug-name corpora.
+
+    python benchmark.py --corpus-sizes 10000 100000 --queries 200 --out bench.json
+    python benchmark.py --methods fuzzywuzzy edit --corpus drugbank
+
+Corpora are built from drug-like syllables and stems with a fixed seed, so runs on different
+machines and commits score the same names. Queries are corpus names with injected typos
+(insertions, deletions, substitutions and transpositions), and a query counts as accurate
+when the top result has the drugbank id of the name it was derived from.
+
+For each corpus size and method the report has the index build time, p50/p99 latency,
+queries per second, peak traced memory (index build plus a few queries) and top-1 accuracy.
+"""
+
+import argparse
+import json
+import math
+import platform
+import random
+import string
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Sequence, Tuple
+from loguru import logger
+from fuzzy_search import fuzzy_search_drug, load_drug_name_map
+
+METHODS = ["fuzzywuzzy", "difflib", "regex", "edit", "phonetic"]
+
+ONSETS = ["", "b", "c", "cl", "d", "f", "fl", "g", "h", "l", "m", "n", "p", "pr", "r", "s", "st", "t",
+          "tr", "v", "x", "z", "ch", "ph", "th"]
+NUCLEI = ["a", "e", "i", "o", "u", "y", "ae", "io"]
+CODAS = ["", "", "n", "r", "l", "m", "x", "s", "t"]
+STEMS = ["azole", "olol", "pril", "sartan", "statin", "mab", "cillin", "mycin", "vir", "dipine",
+         "tidine", "prazole", "oxacin", "afil", "caine", "lukast", "parin", "triptan", "setron", "zepam"]
+SUFFIXES = ["", "", "", "", " hydrochloride", " sodium", " sulfate", " acetate", " citrate"]
+
+def generate_corpus(size: int, seed: int = 0) -> Dict[str, str]:
+    """
+    Generate a synthetic drug name to id map.
+
+    Args:
+        size (int): Number of unique names
+        seed (int): Random seed
+
+    Returns:
+        dict: Maps each name (one to three syllables, a drug stem and sometimes a salt) to a
+              synthetic drugbank id. Names with a salt suffix share the id of their base name
+              when it exists.
+    """
+    rng = random.Random(seed)
+    drug_map = {}
+    while len(drug_map) < size:
+        syllables = "".join(rng.choice(ONSETS) + rng.choice(NUCLEI) + rng.choice(CODAS)
+                            for _ in range(rng.randint(1, 3)))
+        base = syllables + rng.choice(STEMS)
+        name = base + rng.choice(SUFFIXES)
+        if name in drug_map:
+            continue
+        drug_map[name] = drug_map.get(base, f"DB{len(drug_map) + 1:07d}")
+    return drug_map
+
+def inject_typos(name: str, rng: random.Random, n_typos: int = 1) -> str:
+    """
+    Apply n_typos random edits (insertion, deletion, substitution or transposition of adjacent
+    letters) to a name.
+    """
+    chars = list(name)
+    for _ in range(n_typos):
+        edit = rng.choice(["insert", "delete", "substitute", "transpose"])
+        position = rng.randrange(len(chars)) if chars else 0
+        if edit == "insert" or not chars:
+            chars.insert(position, rng.choice(string.ascii_lowercase))
+        elif edit == "delete" and len(chars) > 1:
+            del chars[position]
+        elif edit == "transpose" and position + 1 < len(chars):
+            chars[position], chars[position + 1] = chars[position + 1], chars[position]
+        else:
+            chars[position] = rng.choice(string.ascii_lowercase)
+    return "".join(chars)
+
+def generate_queries(drug_map: Dict[str, str], n_queries: int, seed: int = 0,
+                     max_typos: int = 2) -> List[Tuple[str, str]]:
+    """
+    Generate typo-injected queries from names of a drug map.
+
+    Args:
+        drug_map (dict): Dictionary mapping drug names to drugbank ids
+        n_queries (int): Number of queries
+        seed (int): Random seed
+        max_typos (int): Each query gets between 0 and max_typos typos
+
+    Returns:
+        list: (query, expected drugbank_id) tuples
+    """
+    rng = random.Random(seed)
+    names = list(drug_map.keys())
+    queries = []
+    for _ in range(n_queries):
+        name = rng.choice(names)
+        queries.append((inject_typos(name, rng, rng.randint(0, max_typos)), drug_map[name]))
+    return queries
+
+def _percentile(sorted_values: Sequence[float], percentile: float) -> float:
+    """Nearest-rank percentile of already sorted values."""
+    if not sorted_values:
+        return 0.0
+    rank = math.ceil(percentile / 100 * len(sorted_values))
+    return sorted_values[max(0, min(len(sorted_values), rank) - 1)]
+
+def benchmark_method(drug_map: Dict[str, str],
+                     queries: Sequence[Tuple[str, str]],
+                     method: str,
+                     threshold: float = 70.0,
+                     max_results: int = 5,
+                     time_budget: Optional[float] = None,
+                     memory_sample: int = 10) -> Dict:
+    """
+    Benchmark one method of fuzzy_search_drug.
+
+    Args:
+        drug_map (dict): Dictionary mapping drug names to drugbank ids
+        queries (sequence): (query, expected drugbank_id) tuples
+        method (str): The fuzzy_search_drug method
+        threshold (float): Minimum similarity score passed to fuzzy_search_drug
+        max_results (int): Maximum number of results passed to fuzzy_search_drug
+        time_budget (float, optional): Stop timing queries after this many seconds, so slow methods on
+                                       large corpora still finish. The report says how many queries ran.
+        memory_sample (int): Number of queries run under tracemalloc, after the index build
+
+    Returns:
+        dict: The method's measurements
+    """
+    # The first query builds the method's derived indexes (suffix array, BK-tree, ...); measure it
+    # apart, with the memory of a few more queries, so tracing does not slow down the timed loop.
+    tracemalloc.start()
+    start = time.perf_counter()
+    fuzzy_search_drug(queries[0][0], drug_map, method, threshold, max_results)
+    build_seconds = time.perf_counter() - start
+    for query, _ in queries[1:memory_sample]:
+        fuzzy_search_drug(query, drug_map, method, threshold, max_results)
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    latencies = []
+    correct = 0
+    loop_start = time.perf_counter()
+    for query, expected_id in queries:
+        start = time.perf_counter()
+        results = fuzzy_search_drug(query, drug_map, method, threshold, max_results)
+        latencies.append(time.perf_counter() - start)
+        correct += results[0][1] == expected_id
+        if time_budget is not None and time.perf_counter() - loop_start > time_budget:
+            break
+    total_seconds = time.perf_counter() - loop_start
+    latencies.sort()
+    return {
+        "method": method,
+        "queries": len(latencies),
+        "first_query_seconds": build_seconds,
+        "p50_ms": 1000 * _percentile(latencies, 50),
+        "p99_ms": 1000 * _percentile(latencies, 99),
+        "mean_ms": 1000 * sum(latencies) / len(latencies),
+        "qps": len(latencies) / total_seconds if total_seconds else 0.0,
+        "peak_memory_bytes": peak_memory,
+        "top1_accuracy": correct / len(latencies),
+    }
+
+def run_benchmark(corpus_sizes: Sequence[int],
+                  methods: Sequence[str] = METHODS,
+                  n_queries: int = 200,
+                  seed: int = 0,
+                  threshold: float = 70.0,
+                  max_results: int = 5,
+                  time_budget: Optional[float] = None,
+                  drug_map: Optional[Dict[str, str]] = None) -> Dict:
+    """
+    Benchmark each method over each corpus size.
+
+    Args:
+        corpus_sizes (sequence): Sizes of the synthetic corpora. Ignored if drug_map is given.
+        methods (sequence): fuzzy_search_drug methods to benchmark
+        n_queries (int): Number of queries per corpus
+        seed (int): Random seed for the corpora and queries
+        threshold (float): Minimum similarity score
+        max_results (int): Maximum number of results per query
+        time_budget (float, optional): Per-method time budget in seconds, see benchmark_method
+        drug_map (dict, optional): Benchmark this map (e.g. the real DrugBank map) instead of synthetic corpora
+
+    Returns:
+        dict: The run's parameters, environment and one result per corpus and method
+    """
+    corpora = [("drugbank", len(drug_map))] if drug_map is not None else \
+              [(f"synthetic-{size}", size) for size in corpus_sizes]
+    report = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": seed,
+        "threshold": threshold,
+        "max_results": max_results,
+        "n_queries": n_queries,
+        "results": [],
+    }
+    for corpus_name, size in corpora:
+        corpus = drug_map
+        if corpus is None:
+            start = time.perf_counter()
+            corpus = generate_corpus(size, seed)
+            logger.info(f"Generated {corpus_name} corpus in {time.perf_counter() - start:.2f}s")
+        queries = generate_queries(corpus, n_queries, seed)
+        for method in methods:
+            result = benchmark_method(corpus, queries, method, threshold, max_results, time_budget)
+            result.update(corpus=corpus_name, corpus_size=len(corpus))
+            logger.info(f"[{corpus_name}] {method}: p50 {result['p50_ms']:.2f} ms, p99 {result['p99_ms']:.2f} ms, "
+                        f"{result['qps']:.1f} qps, peak {result['peak_memory_bytes'] / 2**20:.1f} MiB, "
+                        f"top-1 accuracy {result['top1_accuracy']:.3f}")
+            report["results"].append(result)
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the fuzzy_search_drug methods")
+    parser.add_argument("--corpus-sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--corpus", choices=["synthetic", "drugbank"], default="synthetic",
+                        help="Benchmark synthetic corpora, or the saved DrugBank map")
+    parser.add_argument("--map", dest="filepath", default=None, help="Path to the drug map, with --corpus drugbank")
+    parser.add_argument("--methods", nargs="+", choices=METHODS, default=METHODS)
+    parser.add_argument("--queries", type=int, default=200, help="Number of queries per corpus")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--threshold", type=float, default=70.0)
+    parser.add_argument("--max-results", type=int, default=5)
+    parser.add_argument("--time-budget", type=float, default=None, help="Seconds of timed queries per method")
+    parser.add_argument("--out", default=None, help="Write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    drug_map = load_drug_name_map(args.filepath) if args.corpus == "drugbank" else None
+    report = run_benchmark(args.corpus_sizes, args.methods, args.queries, args.seed, args.threshold,
+                           args.max_results, args.time_budget, drug_map)
+    if args.out is None:
+        print(json.dumps(report, indent=2))
+    else:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        logger.info(f"Saved benchmark report to {args.out}")
@@ -0,0 +1,188 @@
+"""
+Compact, memory-mapped on-disk format for the drug name to id map.
+
+The file is read in place through mmap, so lookups do not deserialize anything and
+every process that opens the same file shares its pages through the OS page cache.
+
+Layout (all integers are little-endian uint32):
+    header        magic (8 bytes), format version, number of names, number of ids,
+                  crc32 of everything after the header
+    name_offsets  (n_names + 1) offsets into the name blob
+    name_ids      n_names indexes into the id table
+    name_order    n_names indexes into the name table, in the insertion order of the source map
+    id_offsets    (n_ids + 1) offsets into the id blob
+    name blob     utf-8 drug names, sorted by their utf-8 bytes
+    id blob       utf-8 drugbank ids, sorted
+"""
+
+import mmap
+import os
+import struct
+import sys
+import zlib
+from array import array
+from collections.abc import Mapping
+from typing import Dict, Iterator, Optional
+from loguru import logger
+
+MAGIC = b'DBMAPIDX'
+FORMAT_VERSION = 2
+HEADER = struct.Struct('<8sIIII')
+EXTENSION = '.dbidx'
+
+def _uint32_array(values) -> array:
+    """Build a little-endian uint32 array."""
+    arr = array('I', values)
+    if arr.itemsize != 4:
+        raise RuntimeError("array('I') is not 32 bits wide on this platform")
+    if sys.byteorder == 'big':
+        arr.byteswap()
+    return arr
+
+def write_binary_index(name_to_id: Dict[str, str], filepath: str):
+    """
+    Write a drug name to id map in the binary index format. The file is written to a
+    temporary path first and renamed into place, so readers never see a partial file.
+
+    Args:
+        name_to_id (dict): Dictionary mapping drug names to drugbank ids
+        filepath (str): Path of the index file to write
+    """
+    names = sorted(name.encode('utf-8') for name in name_to_id)
+    name_positions = {name: idx for idx, name in enumerate(names)}
+    ids = sorted({drugbank_id.encode('utf-8') for drugbank_id in name_to_id.values()})
+    id_positions = {drugbank_id: idx for idx, drugbank_id in enumerate(ids)}
+
+    def offsets(blobs):
+        result = [0]
+        for blob in blobs:
+            result.append(result[-1] + len(blob))
+        return _uint32_array(result)
+
+    name_ids = _uint32_array(id_positions[name_to_id[name.decode('utf-8')].encode('utf-8')] for name in names)
+    body = b''.join([
+        offsets(names).tobytes(),
+        name_ids.tobytes(),
+        _uint32_array(name_positions[name.encode('utf-8')] for name in name_to_id).tobytes(),
+        offsets(ids).tobytes(),
+        b''.join(names),
+        b''.join(ids),
+    ])
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, len(names), len(ids), zlib.crc32(body))
+
+    tmp_path = f"{filepath}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(header)
+        f.write(body)
+    os.replace(tmp_path, filepath)
+    logger.info(f"Wrote binary index with {len(names)} names and {len(ids)} ids to {filepath}")
+
+def has_current_format(filepath: str) -> bool:
+    """Check whether a file is a binary index in the format version this module reads."""
+    with open(filepath, 'rb') as f:
+        header = f.read(HEADER.size)
+    if len(header) < HEADER.size:
+        return False
+    magic, version = HEADER.unpack(header)[:2]
+    return magic == MAGIC and version == FORMAT_VERSION
+
+class MmapDrugIndex(Mapping):
+    """
+    Read-only drug name to id mapping backed by a memory-mapped binary index file.
+
+    It can be used wherever a drug map dict is expected. Iteration yields names in the
+    order of the map it was written from (DrugBank order), so fuzzy ties break the same way.
+    """
+
+    def __init__(self, filepath: str, verify: bool = False):
+        """
+        Args:
+            filepath (str): Path to a file written by write_binary_index
+            verify (bool): Whether to check the crc32 of the file contents. This reads the whole file.
+        """
+        self.filepath = filepath
+        with open(filepath, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, n_names, n_ids, crc = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{filepath} is not a drug map binary index")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"{filepath} has format version {version}, expected {FORMAT_VERSION}")
+        if verify and zlib.crc32(self._mm[HEADER.size:]) != crc:
+            raise ValueError(f"{filepath} failed its checksum")
+        self.format_version = version
+        self.crc = crc
+        self._n_names = n_names
+
+        # Offset tables are read in place; only big-endian hosts need to decode them through struct
+        view = memoryview(self._mm)
+        position = HEADER.size
+        self._name_offsets, position = self._uint32_view(view, position, n_names + 1)
+        self._name_ids, position = self._uint32_view(view, position, n_names)
+        self._name_order, position = self._uint32_view(view, position, n_names)
+        self._id_offsets, position = self._uint32_view(view, position, n_ids + 1)
+        self._name_blob = position
+        self._id_blob = position + self._name_offsets[n_names]
+
+    @staticmethod
+    def _uint32_view(view: memoryview, position: int, count: int):
+        """Get a uint32 view of count integers starting at position, and the position after it."""
+        end = position + 4 * count
+        if sys.byteorder == 'little':
+            return view[position:end].cast('I'), end
+        return struct.unpack_from(f'<{count}I', view, position), end
+
+    @property
+    def index_version(self) -> str:
+        """Identifier of the index contents: format version and crc32 of the file body."""
+        return f"v{self.format_version}-{self.crc:08x}"
+
+    def _name_bytes(self, idx: int) -> bytes:
+        start = self._name_blob + self._name_offsets[idx]
+        end = self._name_blob + self._name_offsets[idx + 1]
+        return self._mm[start:end]
+
+    def _id(self, idx: int) -> str:
+        id_idx = self._name_ids[idx]
+        start = self._id_blob + self._id_offsets[id_idx]
+        end = self._id_blob + self._id_offsets[id_idx + 1]
+        return self._mm[start:end].decode('utf-8')
+
+    def _find(self, name: str) -> Optional[int]:
+        """Binary search the sorted name table for name."""
+        key = name.encode('utf-8')
+        lo, hi = 0, self._n_names
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._name_bytes(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self._n_names and self._name_bytes(lo) == key:
+            return lo
+        return None
+
+    def __getitem__(self, name: str) -> str:
+        if not isinstance(name, str):
+            raise KeyError(name)
+        idx = self._find(name)
+        if idx is None:
+            raise KeyError(name)
+        return self._id(idx)
+
+    def __contains__(self, name) -> bool:
+        return isinstance(name, str) and self._find(name) is not None
+
+    def __iter__(self) -> Iterator[str]:
+        for idx in self._name_order:
+            yield self._name_bytes(idx).decode('utf-8')
+
+    def __len__(self) -> int:
+        return self._n_names
+
+    def close(self):
+        """Release the offset views and unmap the file."""
+        for table in (self._name_offsets, self._name_ids, self._name_order, self._id_offsets):
+            if isinstance(table, memoryview):
+                table.release()
+        self._mm.close()
@@ -0,0 +1,179 @@
+"""
+BK-tree over drug names for edit-distance (Levenshtein) lookups.
+
+Run this file to benchmark the BK-tree against the linear fuzzywuzzy scan on common misspellings.
+"""
+
+import os
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+from loguru import logger
+
+# Use a native Levenshtein distance if one is installed
+try:
+    from rapidfuzz.distance import Levenshtein as _rf_levenshtein
+except ImportError:
+    _rf_levenshtein = None
+
+def _pattern_masks(pattern: str) -> Dict[str, int]:
+    """Bit mask of the positions of each character in the pattern, for _bit_parallel_distance."""
+    masks = {}
+    for i, char in enumerate(pattern):
+        masks[char] = masks.get(char, 0) | (1 << i)
+    return masks
+
+def _bit_parallel_distance(pattern: str, masks: Dict[str, int], text: str) -> int:
+    """
+    Levenshtein distance with Hyyrö's bit-parallel algorithm: a whole column of the dynamic
+    programming matrix is updated with a few integer operations per character of text.
+    """
+    m = len(pattern)
+    if m == 0:
+        return len(text)
+    all_ones = (1 << m) - 1
+    last = 1 << (m - 1)
+    pv, mv, score = all_ones, 0, m
+    for char in text:
+        eq = masks.get(char, 0)
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        ph = mv | (~(xh | pv) & all_ones)
+        mh = pv & xh
+        if ph & last:
+            score += 1
+        elif mh & last:
+            score -= 1
+        ph = ((ph << 1) | 1) & all_ones
+        mh = (mh << 1) & all_ones
+        pv = mh | (~(xv | ph) & all_ones)
+        mv = ph & xv
+    return score
+
+def levenshtein(a: str, b: str, max_distance: Optional[int] = None) -> int:
+    """
+    Compute the Levenshtein distance between two strings.
+
+    Args:
+        a (str): First string
+        b (str): Second string
+        max_distance (int, optional): If given, distances above it may be reported as max_distance + 1
+
+    Returns:
+        int: The edit distance (insertions, deletions and substitutions all cost 1)
+    """
+    if _rf_levenshtein is not None:
+        return _rf_levenshtein.distance(a, b, score_cutoff=max_distance)
+    if max_distance is not None and abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    return _bit_parallel_distance(a, _pattern_masks(a), b)
+
+class BKTree:
+    """
+    Burkhard-Keller tree: each child edge is labelled with the edit distance between the child
+    and its parent, so the triangle inequality lets a search skip every subtree whose edge
+    label is further than max_distance from the query's distance to the parent.
+    """
+
+    def __init__(self, words: Iterable[str] = ()):
+        """
+        Args:
+            words (iterable): Words to add to the tree
+        """
+        # Each node is [word, {distance: child node}]
+        self.root = None
+        self.size = 0
+        for word in words:
+            self.add(word)
+
+    def add(self, word: str):
+        """Add a word to the tree. Words already in the tree are ignored."""
+        if self.root is None:
+            self.root = [word, {}]
+            self.size = 1
+            return
+        node = self.root
+        while True:
+            distance = levenshtein(word, node[0])
+            if distance == 0:
+                return
+            child = node[1].get(distance)
+            if child is None:
+                node[1][distance] = [word, {}]
+                self.size += 1
+                return
+            node = child
+
+    def search(self, query: str, max_distance: int) -> List[Tuple[str, int]]:
+        """
+        Find every word within max_distance edits of the query.
+
+        Args:
+            query (str): The word to search for
+            max_distance (int): Maximum edit distance
+
+        Returns:
+            list: (word, distance) tuples sorted by distance, then word
+        """
+        if self.root is None:
+            return []
+        if _rf_levenshtein is not None:
+            distance_to = lambda word: _rf_levenshtein.distance(query, word)
+        else:
+            masks = _pattern_masks(query)
+            distance_to = lambda word: _bit_parallel_distance(query, masks, word)
+        matches = []
+        stack = [self.root]
+        while stack:
+            word, children = stack.pop()
+            distance = distance_to(word)
+            if distance <= max_distance:
+                matches.append((word, distance))
+            low, high = distance - max_distance, distance + max_distance
+            for edge, child in children.items():
+                if low <= edge <= high:
+                    stack.append(child)
+        matches.sort(key=lambda x: (x[1], x[0]))
+        return matches
+
+    def __len__(self) -> int:
+        return self.size
+
+def max_edit_distance(query: str, threshold: float) -> int:
+    """
+    Largest edit distance at which a name can still reach the threshold, with the similarity
+    score 100 * (1 - distance / max(len(query), len(name))).
+
+    Since a name within distance d is at most len(query) + d long, a score of at least
+    threshold requires d <= (100 - threshold) * len(query) / threshold. Integer thresholds are
+    divided exactly, so a distance scoring exactly threshold is not lost to rounding.
+    """
+    if threshold <= 0:
+        return len(query) + 100
+    if float(threshold).is_integer():
+        return (100 - int(threshold)) * len(query) // int(threshold)
+    return int((100 - threshold) * len(query) / threshold + 1e-9)
+
+def edit_similarity(query: str, name: str, distance: int) -> float:
+    """Similarity score (0-100) for two strings at a given edit distance."""
+    longest = max(len(query), len(name))
+    # A single division, so scores that are whole numbers come out exact
+    return 100.0 if longest == 0 else 100.0 * (longest - distance) / longest
+
+if __name__ == "__main__":
+    from fuzzy_search import get_src_dir, load_drug_name_map, fuzzy_search_drug, get_bk_tree
+    src_dir = get_src_dir()
+    drug_map = load_drug_name_map(os.path.join(src_dir, "saved_outputs", "drugbank_name_to_id.pkl"))
+    queries = ["metforimn", "amoxicilin", "paracetamoll", "ibuprofin", "atorvastatine",
+               "omeprazol", "lisinoprill", "simvastatn", "levothyroxin", "warfarine"]
+
+    start = time.perf_counter()
+    tree = get_bk_tree(drug_map)
+    logger.info(f"Built BK-tree over {len(tree)} names in {time.perf_counter() - start:.2f}s")
+
+    for method in ["edit", "fuzzywuzzy"]:
+        start = time.perf_counter()
+        for query in queries:
+            results = fuzzy_search_drug(query, drug_map, method=method)
+            logger.info(f"  [{method}] {query} -> {results[0]}")
+        elapsed = time.perf_counter() - start
+        logger.info(f"{method}: {1000 * elapsed / len(queries):.2f} ms/query")
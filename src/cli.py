@@ -0,0 +1,176 @@
+"""
+Command line batch mapper: matches a column of drug names from a CSV or JSONL file to drugbank ids.
+
+    python cli.py match in.csv --column drug --out out.jsonl
+    python cli.py match in.jsonl --column drug --out out.csv --workers 8 --resume
+
+Input rows are streamed in chunks, matched in parallel and written out as each chunk completes,
+so memory stays constant regardless of the input size. With --resume, rows already present in
+the output file (e.g. after a crash) are skipped and matching continues after the last one.
+"""
+
+import argparse
+import csv
+import io
+import json
+import os
+from collections import deque
+from itertools import islice
+from typing import Dict, Iterator, List, Optional
+from loguru import logger
+from batch_match import iter_search_chunks
+
+RESULT_FIELDS = ["closest_name", "drugbank_id", "score"]
+
+def _file_format(filepath: str) -> str:
+    """Get the format ("csv" or "jsonl") of a file from its extension."""
+    extension = os.path.splitext(filepath)[1].lower()
+    if extension == ".csv":
+        return "csv"
+    if extension in (".jsonl", ".ndjson"):
+        return "jsonl"
+    raise ValueError(f"Unsupported file extension {extension!r}, use .csv or .jsonl")
+
+def iter_input_rows(filepath: str) -> Iterator[Dict]:
+    """
+    Stream the rows of a CSV (with a header) or JSONL file as dicts.
+
+    Args:
+        filepath (str): Path to the input file
+
+    Yields:
+        dict: Each row
+    """
+    with open(filepath, "r", newline="") as f:
+        if _file_format(filepath) == "csv":
+            yield from csv.DictReader(f)
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+def count_written_rows(filepath: str) -> int:
+    """
+    Count the complete rows of an output file, truncating a partially written last row.
+
+    Args:
+        filepath (str): Path to the output file
+
+    Returns:
+        int: Number of data rows (excluding a CSV header)
+    """
+    if not os.path.exists(filepath):
+        return 0
+    with open(filepath, "rb+") as f:
+        data = f.read()
+        complete = data.rfind(b"\n") + 1
+        if complete < len(data):
+            logger.warning(f"Truncating a partially written row at the end of {filepath}")
+            f.truncate(complete)
+    text = data[:complete].decode("utf-8")
+    if _file_format(filepath) == "csv":
+        return max(0, sum(1 for _ in csv.reader(io.StringIO(text))) - 1)
+    return sum(1 for line in text.splitlines() if line.strip())
+
+def iter_chunks(rows: Iterator[Dict], chunk_size: int) -> Iterator[List[Dict]]:
+    """Group rows into lists of chunk_size rows."""
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+def match_file(input_path: str,
+               output_path: str,
+               column: str,
+               method: str = "fuzzywuzzy",
+               threshold: float = 70.0,
+               n_workers: Optional[int] = None,
+               chunk_size: int = 1000,
+               resume: bool = False,
+               filepath: Optional[str] = None,
+               alias_filepath: Optional[str] = None) -> int:
+    """
+    Match the drug names in one column of an input file and write each row with its closest match.
+
+    Args:
+        input_path (str): CSV or JSONL input file
+        output_path (str): CSV or JSONL output file. Each row has the input fields plus closest_name,
+                           drugbank_id and score.
+        column (str): Name of the column (or JSON key) holding the drug names
+        method (str): The matching method to use
+        threshold (float): Minimum similarity score (0-100) for matches
+        n_workers (int, optional): Number of worker processes. Defaults to the number of CPUs.
+        chunk_size (int): Number of rows matched and written at a time
+        resume (bool): Skip the rows already in the output file and append after them. Otherwise the
+                       output file is overwritten.
+        filepath (str, optional): Path to the drug map file
+        alias_filepath (str, optional): Path to an alias index pickle file
+
+    Returns:
+        int: Number of rows written by this run
+    """
+    out_format = _file_format(output_path)
+    skip = count_written_rows(output_path) if resume else 0
+    if skip:
+        logger.info(f"Resuming after {skip} rows already in {output_path}")
+
+    rows = islice(iter_input_rows(input_path), skip, None)
+    row_chunks = iter_chunks(rows, chunk_size)
+    # Keep each chunk's rows until its results come back. Chunks are consumed in order, and the pool
+    # never holds more than a bounded number of them.
+    pending_rows = deque()
+    def query_chunks():
+        for chunk in row_chunks:
+            pending_rows.append(chunk)
+            yield [str(row.get(column) or "") for row in chunk]
+
+    written = 0
+    with open(output_path, "a" if resume else "w", newline="") as out:
+        fieldnames = None
+        for results in iter_search_chunks(query_chunks(), filepath, method, threshold, 1,
+                                          n_workers, alias_filepath):
+            chunk = pending_rows.popleft()
+            buffer = io.StringIO()
+            if out_format == "csv":
+                if fieldnames is None:
+                    fieldnames = list(chunk[0].keys()) + [field for field in RESULT_FIELDS if field not in chunk[0]]
+                writer = csv.DictWriter(buffer, fieldnames=fieldnames, lineterminator="\n")
+                if out.tell() == 0:
+                    writer.writeheader()
+            for row, row_results in zip(chunk, results):
+                closest_name, drugbank_id, score = row_results[0]
+                record = dict(row, closest_name=closest_name, drugbank_id=drugbank_id, score=score)
+                if out_format == "jsonl":
+                    buffer.write(json.dumps(record) + "\n")
+                else:
+                    writer.writerow(record)
+            # Write each chunk in one call and flush it, so a crash leaves at most one partial row
+            out.write(buffer.getvalue())
+            out.flush()
+            written += len(chunk)
+            logger.info(f"Wrote {skip + written} rows to {output_path}")
+    return written
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(prog="drugbank-map", description="Map drug names to drugbank ids")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    match_parser = subparsers.add_parser("match", help="Match a column of drug names from a CSV or JSONL file")
+    match_parser.add_argument("input", help="Input .csv or .jsonl file")
+    match_parser.add_argument("--column", required=True, help="Column (or JSON key) holding the drug names")
+    match_parser.add_argument("--out", required=True, help="Output .csv or .jsonl file")
+    match_parser.add_argument("--method", default="fuzzywuzzy")
+    match_parser.add_argument("--threshold", type=float, default=70.0)
+    match_parser.add_argument("--workers", type=int, default=None, help="Number of worker processes")
+    match_parser.add_argument("--chunk-size", type=int, default=1000, help="Rows matched and written at a time")
+    match_parser.add_argument("--resume", action="store_true", help="Continue after the rows already in --out")
+    match_parser.add_argument("--map", dest="filepath", default=None, help="Path to the drug map (.pkl or .dbidx)")
+    match_parser.add_argument("--aliases", dest="alias_filepath", default=None, help="Path to the alias index pickle")
+    args = parser.parse_args(argv)
+
+    if args.command == "match":
+        match_file(args.input, args.out, args.column, args.method, args.threshold, args.workers,
+                   args.chunk_size, args.resume, args.filepath, args.alias_filepath)
+
+if __name__ == "__main__":
+    main()
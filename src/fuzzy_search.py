@@ -1,10 +1,32 @@
 import pickle
 import os
-from typing import Dict, List, Tuple, Union, Optional
+import heapq
+import hashlib
+import threading
+from collections import Counter, defaultdict
+from functools import partial
+from typing import Any, Callable, Dict, Iterator, List, Tuple, Union, Optional, Set, Sequence, Iterable
 import difflib
-import re
-from fuzzywuzzy import fuzz, process
+from fuzzywuzzy import fuzz, utils as fuzz_utils
 from loguru import logger
+from normalize import normalized_index_key, build_normalized_index, clean_drug_name, base_drug_name, split_combination, build_base_name_index
+from binary_index import MmapDrugIndex, has_current_format, EXTENSION as BINARY_INDEX_EXTENSION
+from query_cache import QueryCache, make_cache_key
+from bk_tree import BKTree, max_edit_distance, edit_similarity
+from prefix_index import PrefixIndex
+from suffix_array import SuffixArray
+from phonetic import PhoneticIndex, phonetic_keys
+from length_index import LengthBucketIndex
+from artifact_store import ArtifactStore, open_store, file_sha256
+from sqlite_index import SqliteDrugIndex, EXTENSION as SQLITE_INDEX_EXTENSION
+
+# rapidfuzz and numpy are only needed for bulk scoring (fuzzy_search_many)
+try:
+    import numpy as np
+    from rapidfuzz import fuzz as rf_fuzz, process as rf_process
+    RAPIDFUZZ_AVAILABLE = True
+except ImportError:
+    RAPIDFUZZ_AVAILABLE = False
 
 # Get the path to the src directory
 def get_src_dir():
@@ -19,34 +41,63 @@ def get_src_dir():
     else:
         return os.getcwd()
 
+def get_artifact_store() -> ArtifactStore:
+    """Get the artifact store generate_map saves its outputs to (the saved_outputs directory)."""
+    return open_store(get_src_dir())
+
+def find_latest_saved_output(prefix: str, extension: str = '.pkl', release: Optional[str] = None) -> str:
+    """
+    Find the latest saved output called prefix, as recorded in the saved_outputs manifest. Outputs
+    saved before the manifest existed are found by taking the most recent file starting with prefix.
+    
+    Args:
+        prefix (str): Name of the saved output, e.g. "drugbank_name_to_id"
+        extension (str): File extension of the saved output
+        release (str, optional): Only consider outputs built from this DrugBank release
+    
+    Returns:
+        str: Path to the latest matching file
+    """
+    store = get_artifact_store()
+    filepath = store.resolve(prefix, extension, release)
+    if filepath is not None:
+        return filepath
+    if release is not None:
+        raise FileNotFoundError(f"No {prefix}{extension} saved for DrugBank release {release} in {store.directory}")
+
+    saved_outputs_dir = store.directory
+    
+    # Fall back to the most recent unversioned file
+    if not os.path.exists(saved_outputs_dir):
+        raise FileNotFoundError(f"Saved maps directory not found at {saved_outputs_dir}")
+    files = [f for f in os.listdir(saved_outputs_dir) if f.startswith(prefix) and f.endswith(extension)]
+    if not files:
+        raise FileNotFoundError(f"No {prefix}{extension} files found in {saved_outputs_dir}")
+        
+    # Sort by creation time (newest first)
+    files.sort(key=lambda x: os.path.getctime(os.path.join(saved_outputs_dir, x)), reverse=True)
+    return os.path.join(saved_outputs_dir, files[0])
+
 def load_drug_name_map(filepath: Optional[str] = None) -> Dict[str, str]:
     """
-    Load the drug name to id map from a pickle file.
+    Load the drug name to id map from a pickle file or a binary index file.
     
     Args:
-        filepath (str, optional): Path to the pickle file. If None, will try to find the most recent
-                                  drug_name_to_id file in saved_outputs directory.
+        filepath (str, optional): Path to the pickle file, or to a binary index file (.dbidx) which is
+                                  memory-mapped instead of deserialized. If None, will try to find the most
+                                  recent drugbank_name_to_id binary index, then pickle file, in saved_outputs
+                                  directory.
     
     Returns:
-        dict: A dictionary mapping drug names to drugbank ids
+        dict: A dictionary (or a read-only MmapDrugIndex mapping) from drug names to drugbank ids
     """
     if filepath is None:
-        logger.warning("No filepath provided. Trying to find the most recent drug_name_to_id pkl file")
-        # Get the src directory
-        src_dir = get_src_dir()
-        saved_outputs_dir = os.path.join(src_dir, 'saved_outputs')
-        
-        # Try to find the most recent drug_name_to_id file
-        if os.path.exists(saved_outputs_dir):
-            files = [f for f in os.listdir(saved_outputs_dir) if f.startswith('drug_name_to_id') and f.endswith('.pkl')]
-            if not files:
-                raise FileNotFoundError(f"No drug_name_to_id pickle files found in {saved_outputs_dir}")
-                
-            # Sort by creation time (newest first)
-            files.sort(key=lambda x: os.path.getctime(os.path.join(saved_outputs_dir, x)), reverse=True)
-            filepath = os.path.join(saved_outputs_dir, files[0])
-        else:
-            raise FileNotFoundError(f"Saved maps directory not found at {saved_outputs_dir}")
+        logger.warning("No filepath provided. Trying to find the most recent drugbank_name_to_id file")
+        filepath = _resolve_default_map_path()
+    
+    if filepath.endswith(BINARY_INDEX_EXTENSION):
+        logger.info(f"Memory-mapping drug name to id index {filepath}")
+        return MmapDrugIndex(filepath)
     
     logger.info(f"Loading drug name to id map from {filepath}")
     with open(filepath, 'rb') as f:
@@ -54,11 +105,527 @@ def load_drug_name_map(filepath: Optional[str] = None) -> Dict[str, str]:
     
     return drug_map
 
+def load_alias_index(filepath: Optional[str] = None) -> Dict[str, List[Tuple[str, str]]]:
+    """
+    Load the alias index built by generate_map.build_drugbank_maps from a pickle file.
+    
+    Args:
+        filepath (str, optional): Path to the pickle file. If None, will try to find the most recent
+                                  drugbank_alias_index file in saved_outputs directory.
+    
+    Returns:
+        dict: A dictionary mapping each alias (primary name, synonym, brand, product or mixture name)
+              to a list of (drugbank_id, alias_type) tuples
+    """
+    if filepath is None:
+        filepath = find_latest_saved_output('drugbank_alias_index')
+    
+    logger.info(f"Loading alias index from {filepath}")
+    with open(filepath, 'rb') as f:
+        alias_index = pickle.load(f)
+    
+    return alias_index
+
+def load_base_name_index(filepath: Optional[str] = None) -> Dict[str, List[Tuple[str, str]]]:
+    """
+    Load the base-name index built by generate_map.build_drugbank_maps from a pickle file.
+    
+    Args:
+        filepath (str, optional): Path to the pickle file. If None, will try to find the most recent
+                                  drugbank_base_name_index file in saved_outputs directory.
+    
+    Returns:
+        dict: A dictionary mapping cleaned and normalized drug names to lists of (drug_name, drugbank_id)
+              tuples, see normalize.build_base_name_index
+    """
+    if filepath is None:
+        filepath = find_latest_saved_output('drugbank_base_name_index')
+    
+    logger.info(f"Loading base-name index from {filepath}")
+    with open(filepath, 'rb') as f:
+        base_name_index = pickle.load(f)
+    
+    return base_name_index
+
+def base_name_matches(query: str,
+                      base_name_index: Dict[str, List[Tuple[str, str]]],
+                      max_results: int = 5) -> List[Tuple[str, str, float]]:
+    """
+    Look up a drug name, or each component of a combination product, in the base-name index. Each
+    component is looked up by its cleaned form (salts kept), then by its base form (see normalize.base_drug_name).
+    
+    Args:
+        query (str): The drug name to look up, e.g. "amoxicillin + clavulanic acid" or "morphine sulfate 10 mg"
+        base_name_index (dict): Index as returned by load_base_name_index
+        max_results (int): Maximum number of results to return for a single drug
+    
+    Returns:
+        list: (drug_name, drugbank_id, 100.0) tuples. For a combination product, the best hit of each
+              component in order; empty unless every component was found.
+    """
+    components = split_combination(query)
+    hits = []
+    for component in components:
+        entries = base_name_index.get(clean_drug_name(component)) or base_name_index.get(base_drug_name(component))
+        if not entries:
+            return []
+        hits.append(entries)
+    if len(hits) == 1:
+        return [(drug_name, drugbank_id, 100.0) for drug_name, drugbank_id in hits[0][:max_results]]
+    return [(entries[0][0], entries[0][1], 100.0) for entries in hits]
+
+def cleaned_name_matches(query: str,
+                         base_name_index: Dict[str, List[Tuple[str, str]]],
+                         max_results: int = 5) -> List[Tuple[str, str, float]]:
+    """
+    Look up the cleaned form of a drug name (salts kept, see normalize.clean_drug_name) in the base-name
+    index, so that "hydrocortisone acetate 1% cream" finds the salt before salts are stripped.
+    
+    Args:
+        query (str): The drug name to look up
+        base_name_index (dict): Index as returned by load_base_name_index
+        max_results (int): Maximum number of results to return
+    
+    Returns:
+        list: (drug_name, drugbank_id, 100.0) tuples. Empty if the cleaned name is not in the index.
+    """
+    entries = base_name_index.get(clean_drug_name(query), ())
+    return [(drug_name, drugbank_id, 100.0) for drug_name, drugbank_id in entries[:max_results]]
+
+def alias_matches(query: str,
+                  alias_index: Dict[str, List[Tuple[str, str]]],
+                  max_results: int = 5) -> List[Tuple[str, str, float]]:
+    """
+    Look up an exact alias hit for an already lowercased and stripped query.
+    
+    Args:
+        query (str): The normalized drug name to look up
+        alias_index (dict): Alias index as returned by load_alias_index
+        max_results (int): Maximum number of results to return
+    
+    Returns:
+        list: (alias, drugbank_id, 100.0) tuples, one per distinct drugbank id the alias belongs to.
+              Empty if the query is not an alias.
+    """
+    results = []
+    for drugbank_id, _ in alias_index.get(query, ()):
+        if len(results) == max_results:
+            break
+        if all(drugbank_id != result[1] for result in results):
+            results.append((query, drugbank_id, 100.0))
+    return results
+
+def _sort_tokens(text: str) -> str:
+    """Lowercase a string and sort its whitespace-separated tokens."""
+    return " ".join(sorted(text.lower().split()))
+
+def _token_sort_form(drug_name: str) -> str:
+    """The form of a choice that process.extract compares with fuzz.token_sort_ratio."""
+    return " ".join(sorted(fuzz_utils.full_process(drug_name, force_ascii=True).split()))
+
+def _token_sort_query_form(query: str) -> str:
+    """The form of a query that process.extract compares with fuzz.token_sort_ratio."""
+    return " ".join(sorted(fuzz_utils.full_process(fuzz_utils.full_process(query), force_ascii=True).split()))
+
+def _char_ngrams(sorted_text: str, n: int = 3) -> Set[str]:
+    """
+    Get the set of character n-grams of a token-sorted string (see _sort_tokens), so that
+    word order does not matter (mirroring token_sort_ratio). The string is padded with a
+    space on each side so that word boundaries produce their own n-grams.
+    """
+    padded = f" {sorted_text} "
+    return {padded[i:i + n] for i in range(len(padded) - n + 1)}
+
+class NgramIndex:
+    """
+    Character n-gram inverted index over the drug names, used to shortlist candidates
+    before running the expensive fuzzy scorer.
+
+    Build it once from the drug name to id map and pass it to fuzzy_search_drug.
+    """
+
+    def __init__(self, drug_map: Dict[str, str], n: int = 3,
+                 sorted_names: Optional[Sequence[str]] = None):
+        """
+        Args:
+            drug_map (dict): Dictionary mapping drug names to drugbank ids
+            n (int): Length of the character n-grams
+            sorted_names (sequence, optional): Precomputed token-sorted forms of the drug names,
+                                               in map order. Computed here if not provided.
+        """
+        self.n = n
+        self.names = list(drug_map.keys())
+        if sorted_names is None:
+            sorted_names = [_sort_tokens(drug_name) for drug_name in self.names]
+        self.gram_counts = []
+        postings = defaultdict(list)
+        for idx, sorted_name in enumerate(sorted_names):
+            grams = _char_ngrams(sorted_name, n)
+            self.gram_counts.append(len(grams))
+            for gram in grams:
+                postings[gram].append(idx)
+        self.postings = dict(postings)
+        logger.info(f"Built {n}-gram index with {len(self.postings)} n-grams over {len(self.names)} names")
+
+    def candidates(self, query: str, max_candidates: int = 500) -> List[str]:
+        """
+        Get the drug names whose n-gram sets are most similar (Dice coefficient) to the query's.
+
+        Args:
+            query (str): The drug name to search for
+            max_candidates (int): Maximum number of candidates to return
+
+        Returns:
+            list: Candidate drug names, in the same order as the drug map. Empty if the
+                  query shares no n-gram with any drug name.
+        """
+        return [self.names[idx] for idx in self.candidate_positions(query, max_candidates)]
+
+    def candidate_positions(self, query: str, max_candidates: int = 500) -> List[int]:
+        """Same as candidates, as positions of the names in the drug map."""
+        query_grams = _char_ngrams(_sort_tokens(query), self.n)
+        counts = Counter()
+        for gram in query_grams:
+            for idx in self.postings.get(gram, ()):
+                counts[idx] += 1
+        # Keep the best overlaps, then restore map order so ties are scored the same way
+        # as a full scan would score them
+        n_query = len(query_grams)
+        best = heapq.nlargest(max_candidates, counts.items(),
+                              key=lambda x: (x[1] / (n_query + self.gram_counts[x[0]]), -x[0]))
+        return sorted(idx for idx, _ in best)
+
+# Indexes derived from drug maps by get_derived_index, keyed by id(map). Each entry keeps the map itself,
+# so its id cannot be reused by another object while cached, its size when indexed and its indexes by kind.
+_derived_indexes: Dict[int, Tuple[Dict[str, str], int, Dict[str, Any]]] = {}
+
+def get_derived_index(drug_map: Dict[str, str], kind: str, build: Callable[[Dict[str, str]], Any]) -> Any:
+    """
+    Get an index derived from a drug map, building it on first use. The indexes of a map are rebuilt
+    if its size changed; code that edits a map in place without changing its size (e.g. renaming a
+    drug) must call invalidate_derived_indexes.
+    
+    Args:
+        drug_map (dict): Dictionary mapping drug names to drugbank ids
+        kind (str): Name of the index, e.g. "bk_tree"
+        build (callable): Builds the index from the drug map
+    
+    Returns:
+        The derived index
+    """
+    entry = _derived_indexes.get(id(drug_map))
+    if entry is None or entry[0] is not drug_map or entry[1] != len(drug_map):
+        if len(_derived_indexes) >= 8:
+            _derived_indexes.clear()
+        entry = (drug_map, len(drug_map), {})
+        _derived_indexes[id(drug_map)] = entry
+    indexes = entry[2]
+    if kind not in indexes:
+        indexes[kind] = build(drug_map)
+    return indexes[kind]
+
+def invalidate_derived_indexes(index: Any):
+    """Drop the cached indexes and versions of a drug map or alias index that was edited in place."""
+    _derived_indexes.pop(id(index), None)
+    _alias_index_versions.pop(id(index), None)
+
+def get_bk_tree(drug_map: Dict[str, str]) -> BKTree:
+    """Get the BK-tree over a drug map's names, built once per map."""
+    return get_derived_index(drug_map, "bk_tree", lambda m: BKTree(m.keys()))
+
+def get_prefix_index(drug_map: Dict[str, str]) -> PrefixIndex:
+    """Get the prefix completion index over a drug map's names, built once per map."""
+    return get_derived_index(drug_map, "prefix_index", PrefixIndex)
+
+def get_suffix_array(drug_map: Dict[str, str]) -> SuffixArray:
+    """Get the suffix array over a drug map's names, built once per map."""
+    return get_derived_index(drug_map, "suffix_array", lambda m: SuffixArray(list(m.keys())))
+
+def load_phonetic_index(filepath: Optional[str] = None) -> PhoneticIndex:
+    """
+    Load the phonetic index built by generate_map.build_drugbank_maps from a pickle file.
+    
+    Args:
+        filepath (str, optional): Path to the pickle file. If None, will try to find the most recent
+                                  drugbank_phonetic_index file in saved_outputs directory.
+    
+    Returns:
+        PhoneticIndex: The phonetic index
+    """
+    if filepath is None:
+        filepath = find_latest_saved_output('drugbank_phonetic_index')
+    
+    logger.info(f"Loading phonetic index from {filepath}")
+    with open(filepath, 'rb') as f:
+        phonetic_index = pickle.load(f)
+    
+    return phonetic_index
+
+def _load_or_build_phonetic_index(drug_map: Dict[str, str]) -> PhoneticIndex:
+    """Use the phonetic index saved by generate_map if it was built over drug_map's names, otherwise build one."""
+    try:
+        phonetic_index = load_phonetic_index()
+        if phonetic_index.is_built_from(drug_map):
+            return phonetic_index
+        logger.info("Saved phonetic index is for a different drug map, rebuilding it")
+    except FileNotFoundError:
+        pass
+    return PhoneticIndex(drug_map)
+
+def load_sqlite_index(filepath: Optional[str] = None) -> SqliteDrugIndex:
+    """
+    Open the SQLite search database built by generate_map.build_drugbank_maps, read-only.
+    
+    Args:
+        filepath (str, optional): Path to the database. If None, will try to find the most recent
+                                  drugbank_sqlite_index file in saved_outputs directory.
+    
+    Returns:
+        SqliteDrugIndex: The database, with one connection per thread that searches it
+    """
+    if filepath is None:
+        filepath = find_latest_saved_output('drugbank_sqlite_index', SQLITE_INDEX_EXTENSION)
+    
+    logger.info(f"Opening SQLite index at {filepath}")
+    return SqliteDrugIndex(filepath)
+
+# The SQLite index opened by get_sqlite_index, shared by every thread of the process
+_sqlite_index: Optional[SqliteDrugIndex] = None
+_sqlite_index_lock = threading.Lock()
+
+def get_sqlite_index() -> SqliteDrugIndex:
+    """Get the saved SQLite index, opened once per process (see load_sqlite_index)."""
+    global _sqlite_index
+    if _sqlite_index is None:
+        with _sqlite_index_lock:
+            if _sqlite_index is None:
+                _sqlite_index = load_sqlite_index()
+    return _sqlite_index
+
+def _sqlite_search(query: str,
+                   sqlite_index: SqliteDrugIndex,
+                   threshold: float,
+                   max_results: int,
+                   max_candidates: int = 200) -> List[Tuple[str, str, float]]:
+    """
+    Score the names and aliases the SQLite index shortlists by shared trigrams with fuzz.token_sort_ratio,
+    the scorer of the "fuzzywuzzy" method. Names are ranked by score, then by their trigram rank.
+    """
+    processed_query = _token_sort_query_form(query)
+    scored = ((drug_name, drugbank_id, fuzz.ratio(processed_query, _token_sort_form(drug_name)))
+              for drug_name, drugbank_id in sqlite_index.candidates(query, max_candidates))
+    matches = heapq.nlargest(max_results, scored, key=lambda x: x[2])
+    return [match for match in matches if match[2] >= threshold]
+
+def get_length_index(drug_map: Dict[str, str]) -> LengthBucketIndex:
+    """Get the length-bucketed index of a drug map's token-sorted names, built once per map."""
+    return get_derived_index(drug_map, "length_index",
+                             lambda m: LengthBucketIndex(list(m.keys()), [_token_sort_form(name) for name in m.keys()]))
+
+def _token_sort_search(query: str,
+                       length_index: LengthBucketIndex,
+                       drug_map: Dict[str, str],
+                       threshold: float,
+                       max_results: int,
+                       positions: Optional[List[int]] = None) -> List[Tuple[str, str, float]]:
+    """
+    Score the names that can still reach threshold (see LengthBucketIndex.filter) as
+    process.extract(query, names, scorer=fuzz.token_sort_ratio) would, but against the token-sorted
+    forms precomputed in the index: only the query is processed, and each name costs one fuzz.ratio.
+    Names are scored in map order and ranked with the same stable selection, so ties rank as in a full scan.
+    """
+    processed_query = _token_sort_query_form(query)
+    processed_names = length_index.processed_names
+    scored = ((idx, fuzz.ratio(processed_query, processed_names[idx]))
+              for idx in length_index.filter(processed_query, threshold, positions))
+    matches = heapq.nlargest(max_results, scored, key=lambda x: x[1])
+    return [(length_index.names[idx], drug_map[length_index.names[idx]], score)
+            for idx, score in matches if score >= threshold]
+
+# Thresholds from which the n-gram shortlist costs more than it saves on the full token_sort scan
+NGRAM_SHORTLIST_MAX_THRESHOLD = 70
+
+def _shortlisted_token_sort_search(query: str,
+                                   ngram_index: NgramIndex,
+                                   length_index: LengthBucketIndex,
+                                   drug_map: Dict[str, str],
+                                   threshold: float,
+                                   max_results: int,
+                                   max_candidates: int = 50) -> List[Tuple[str, str, float]]:
+    """
+    Same results as _token_sort_search over every name, using the n-gram shortlist to raise the threshold.
+    When the shortlist has max_results hits, the true top results all score at least the worst of them,
+    so the full scan only needs the names that can reach that score (see LengthBucketIndex.filter).
+    Otherwise the full scan runs at the requested threshold. At thresholds of NGRAM_SHORTLIST_MAX_THRESHOLD
+    and above the length filter already prunes as much, so the shortlist is skipped.
+    """
+    if threshold >= NGRAM_SHORTLIST_MAX_THRESHOLD:
+        return _token_sort_search(query, length_index, drug_map, threshold, max_results)
+    positions = ngram_index.candidate_positions(query, max_candidates)
+    if positions:
+        shortlisted = _token_sort_search(query, length_index, drug_map, threshold, max_results, positions)
+        if len(shortlisted) == max_results:
+            threshold = max(threshold, shortlisted[-1][2])
+    return _token_sort_search(query, length_index, drug_map, threshold, max_results)
+
+def get_phonetic_index(drug_map: Dict[str, str]) -> PhoneticIndex:
+    """Get the phonetic index over a drug map's names, loaded or built once per map."""
+    return get_derived_index(drug_map, "phonetic_index", _load_or_build_phonetic_index)
+
+def _substring_search(query: str,
+                      suffix_array: SuffixArray,
+                      drug_map: Dict[str, str],
+                      threshold: float,
+                      max_results: int) -> List[Tuple[str, str, float]]:
+    """Score only the names containing the query, in map order so ties keep it."""
+    matches = []
+    for idx in suffix_array.matches(query):
+        drug_name = suffix_array.names[idx]
+        similarity = difflib.SequenceMatcher(None, query, drug_name).ratio() * 100
+        if similarity >= threshold:
+            matches.append((drug_name, similarity))
+    matches.sort(key=lambda x: x[1], reverse=True)
+    return [(drug_name, drug_map[drug_name], score) for drug_name, score in matches[:max_results]]
+
+def iter_drugs_containing(substring: str,
+                          drug_map: Optional[Dict[str, str]] = None) -> Iterator[Tuple[str, str]]:
+    """
+    Lazily iterate over the drugs whose name contains a substring, without scoring them.
+    Useful for very short substrings that hit thousands of names.
+    
+    Args:
+        substring (str): The substring to look for. It is lowercased and stripped.
+        drug_map (dict, optional): Dictionary mapping drug names to drugbank ids. If None, the process-wide
+                                   map from get_drug_map is used.
+    
+    Yields:
+        tuple: (drug_name, drugbank_id), in suffix array order
+    """
+    if drug_map is None:
+        drug_map = get_drug_map()
+    suffix_array = get_suffix_array(drug_map)
+    for idx in suffix_array.iter_matches(substring.lower().strip()):
+        drug_name = suffix_array.names[idx]
+        yield drug_name, drug_map[drug_name]
+
+def _edit_search(query: str,
+                 bk_tree: BKTree,
+                 drug_map: Dict[str, str],
+                 threshold: float,
+                 max_results: int) -> List[Tuple[str, str, float]]:
+    """Find the names within the edit distance allowed by threshold and score them."""
+    results = []
+    for drug_name, distance in bk_tree.search(query, max_edit_distance(query, threshold)):
+        similarity = edit_similarity(query, drug_name, distance)
+        if similarity >= threshold:
+            results.append((drug_name, drug_map[drug_name], similarity))
+    results.sort(key=lambda x: x[2], reverse=True)
+    return results[:max_results]
+
+def group_by_length(names: Iterable[str]) -> Dict[int, List[Tuple[str, Tuple[Tuple[str, int], ...]]]]:
+    """
+    Group names by length, keeping their order within each length, with each name's character counts
+    (used by _difflib_top_k to bound SequenceMatcher.quick_ratio without recounting the name).
+    """
+    names_by_length = defaultdict(list)
+    for name in names:
+        names_by_length[len(name)].append((name, tuple(Counter(name).items())))
+    return dict(names_by_length)
+
+def get_names_by_length(drug_map: Dict[str, str]) -> Dict[int, List[Tuple[str, Tuple[Tuple[str, int], ...]]]]:
+    """Get a drug map's names grouped by length, built once per map."""
+    return get_derived_index(drug_map, "names_by_length", group_by_length)
+
+def _difflib_top_k(query: str,
+                   names_by_length: Dict[int, List[Tuple[str, Tuple[Tuple[str, int], ...]]]],
+                   k: int,
+                   cutoff: float) -> List[Tuple[float, str]]:
+    """
+    Select the same names as difflib.get_close_matches(query, names, k, cutoff), scoring each name
+    at most once. A bounded heap holds the best k (ratio, name) pairs so far, and a name is only scored
+    when its upper bounds can still reach the k-th best ratio:
+        real_quick_ratio, which only depends on the lengths, is checked once per length. Lengths are
+        visited from the highest bound down, so the heap fills with good matches early and the remaining
+        lengths are skipped as soon as their bound falls below the k-th best.
+        quick_ratio, the share of characters in common, is computed from the name's precomputed
+        character counts.
+    
+    Args:
+        query (str): The query
+        names_by_length (dict): Candidate names grouped by length, see group_by_length
+        k (int): Number of names to select
+        cutoff (float): Minimum ratio (0-1)
+    
+    Returns:
+        list: (ratio, name) tuples, best first (ties broken by name, descending, as get_close_matches)
+    """
+    if k <= 0:
+        return []
+    matcher = difflib.SequenceMatcher()
+    # The query is the second sequence, whose index SequenceMatcher builds once and reuses
+    matcher.set_seq2(query)
+    query_length = len(query)
+    query_counts = Counter(query).get
+    # The bounds are computed exactly as difflib computes real_quick_ratio and quick_ratio
+    length_bounds = sorted(((2.0 * min(length, query_length) / (length + query_length) if length + query_length else 1.0,
+                             length) for length in names_by_length), reverse=True)
+    heap = []
+    bound = cutoff
+    for length_bound, length in length_bounds:
+        if length_bound < bound:
+            break
+        total_length = length + query_length
+        for name, char_counts in names_by_length[length]:
+            if total_length:
+                common = 0
+                for char, count in char_counts:
+                    query_count = query_counts(char)
+                    if query_count:
+                        common += count if count < query_count else query_count
+                if 2.0 * common / total_length < bound:
+                    continue
+            matcher.set_seq1(name)
+            ratio = matcher.ratio()
+            if ratio < bound:
+                continue
+            if len(heap) < k:
+                heapq.heappush(heap, (ratio, name))
+            elif (ratio, name) > heap[0]:
+                heapq.heapreplace(heap, (ratio, name))
+            else:
+                continue
+            if len(heap) == k:
+                # Names only tying the k-th best ratio can still win on the name, so the bound is not strict
+                bound = max(cutoff, heap[0][0])
+    return sorted(heap, reverse=True)
+
+def _phonetic_search(query: str,
+                     phonetic_index: PhoneticIndex,
+                     drug_map: Dict[str, str],
+                     threshold: float,
+                     max_results: int) -> List[Tuple[str, str, float]]:
+    """
+    Score the names whose phonetic key is close to the query's by the edit similarity of the keys.
+    Names with equally close keys are ranked by their spelled similarity to the query.
+    """
+    max_distance = max(max_edit_distance(key, threshold) for key in phonetic_keys(query))
+    scored = []
+    for drug_name, (query_key, key, distance) in phonetic_index.candidates(query, max_distance).items():
+        similarity = edit_similarity(query_key, key, distance)
+        if similarity >= threshold:
+            scored.append((similarity, fuzz.ratio(query, drug_name), drug_name))
+    scored.sort(key=lambda x: (-x[0], -x[1], x[2]))
+    return [(drug_name, drug_map[drug_name], similarity) for similarity, _, drug_name in scored[:max_results]]
+
 def fuzzy_search_drug(query: str, 
                       drug_map: Dict[str, str],
                       method: str = "fuzzywuzzy",
                       threshold: float = 70.0,
-                      max_results: int = 5) -> List[Tuple[str, str, float]]:
+                      max_results: int = 5,
+                      ngram_index: Optional[NgramIndex] = None,
+                      alias_index: Optional[Dict[str, List[Tuple[str, str]]]] = None,
+                      phonetic_index: Optional[PhoneticIndex] = None,
+                      sqlite_index: Optional[SqliteDrugIndex] = None) -> List[Tuple[str, str, float]]:
     """
     Search for a drug name using fuzzy matching.
     
@@ -68,59 +635,70 @@ def fuzzy_search_drug(query: str,
         method (str): The matching method to use. Options: 
                       "fuzzywuzzy" - Uses fuzzywuzzy's process.extract
                       "difflib" - Uses difflib's get_close_matches
-                      "regex" - Uses regex partial matching
+                      "regex" - Uses substring (partial) matching through a suffix array, scored with difflib
+                      "edit" - Uses a BK-tree to find names within a Levenshtein distance, scored as
+                               100 * (1 - distance / length of the longer string)
+                      "phonetic" - Finds sound-alike names through their phonetic keys (see phonetic), scored
+                                   like "edit" but on the keys
+                      "sqlite" - Shortlists names and aliases by shared trigrams in the on-disk SQLite index
+                                 (see sqlite_index) and scores them like "fuzzywuzzy". drug_map is not used,
+                                 so it can be empty in processes that do not load the map.
         threshold (float): Minimum similarity score (0-100) for matches to be returned
         max_results (int): Maximum number of results to return
+        ngram_index (NgramIndex, optional): N-gram index built from drug_map. If provided and threshold is
+                                            below NGRAM_SHORTLIST_MAX_THRESHOLD, the "fuzzywuzzy" method
+                                            scores its shortlist first and raises the threshold of the full
+                                            scan to the worst top score found there. Results are unchanged.
+        alias_index (dict, optional): Alias index as returned by load_alias_index. If provided, an exact
+                                      alias hit is returned with a score of 100 without fuzzy scoring.
+        phonetic_index (PhoneticIndex, optional): Phonetic index used by the "phonetic" method. Defaults
+                                                  to the one saved by generate_map for drug_map.
+        sqlite_index (SqliteDrugIndex, optional): SQLite index used by the "sqlite" method. Defaults to
+                                                  the one saved by generate_map, see get_sqlite_index.
     
     Returns:
         list: List of tuples containing (drug_name, drugbank_id, similarity_score)
     """
     query = query.lower().strip()
+    if alias_index is not None:
+        results = alias_matches(query, alias_index, max_results)
+        if results:
+            return results
     results = []
     
     if method == "fuzzywuzzy":
-        # Use fuzzywuzzy to find matches
-        matches = process.extract(query, drug_map.keys(), 
-                                  scorer=fuzz.token_sort_ratio, 
-                                  limit=max_results)
-        for drug_name, score in matches:
-            if score >= threshold:
-                results.append((drug_name, drug_map[drug_name], score))
+        # Use fuzzywuzzy to score the names that can still reach the threshold, raised through the
+        # n-gram shortlist at low thresholds if there is one
+        if ngram_index is not None:
+            results = _shortlisted_token_sort_search(query, ngram_index, get_length_index(drug_map), drug_map,
+                                                     threshold, max_results)
+        else:
+            results = _token_sort_search(query, get_length_index(drug_map), drug_map, threshold, max_results)
     
     elif method == "difflib":
-        # Use difflib to find matches
-        drug_names = list(drug_map.keys())
-        matches = difflib.get_close_matches(query, drug_names, n=max_results, cutoff=threshold/100)
-        
-        # Calculate similarity scores
-        for drug_name in matches:
-            similarity = difflib.SequenceMatcher(None, query, drug_name).ratio() * 100
-            results.append((drug_name, drug_map[drug_name], similarity))
-            
-        # Sort by similarity score
-        results.sort(key=lambda x: x[2], reverse=True)
+        # Select the best names as difflib.get_close_matches would, keeping the scores
+        for ratio, drug_name in _difflib_top_k(query, get_names_by_length(drug_map), max_results, threshold/100):
+            results.append((drug_name, drug_map[drug_name], ratio * 100))
     
     elif method == "regex":
-        # Build a simple regex pattern for partial matching
-        pattern = f".*{re.escape(query)}.*"
-        regex = re.compile(pattern)
-        
-        # Find matches
-        matches = []
-        for drug_name in drug_map.keys():
-            if regex.match(drug_name):
-                # Calculate similarity using difflib
-                similarity = difflib.SequenceMatcher(None, query, drug_name).ratio() * 100
-                if similarity >= threshold:
-                    matches.append((drug_name, similarity))
-        
-        # Sort by similarity and take top matches
-        matches.sort(key=lambda x: x[1], reverse=True)
-        for drug_name, score in matches[:max_results]:
-            results.append((drug_name, drug_map[drug_name], score))
+        results = _substring_search(query, get_suffix_array(drug_map), drug_map, threshold, max_results)
+    
+    elif method == "edit":
+        results = _edit_search(query, get_bk_tree(drug_map), drug_map, threshold, max_results)
+    
+    elif method == "phonetic":
+        if phonetic_index is None:
+            phonetic_index = get_phonetic_index(drug_map)
+        results = _phonetic_search(query, phonetic_index, drug_map, threshold, max_results)
+    
+    elif method == "sqlite":
+        if sqlite_index is None:
+            sqlite_index = get_sqlite_index()
+        results = _sqlite_search(query, sqlite_index, threshold, max_results)
     
     else:
-        raise ValueError(f"Unknown method: {method}. Choose from 'fuzzywuzzy', 'difflib', or 'regex'")
+        raise ValueError(f"Unknown method: {method}. Choose from 'fuzzywuzzy', 'difflib', 'regex', 'edit', "
+                         "'phonetic' or 'sqlite'")
 
     # Sort by similarity score
     results.sort(key=lambda x: x[2], reverse=True)
@@ -129,28 +707,619 @@ def fuzzy_search_drug(query: str,
         return [('', '', 0.0)]
     return results
 
+def lookup_drug(query: str,
+                drug_map: Dict[str, str],
+                method: str = "fuzzywuzzy",
+                threshold: float = 70.0,
+                max_results: int = 5,
+                normalized_index: Optional[Dict[str, str]] = None,
+                alias_index: Optional[Dict[str, List[Tuple[str, str]]]] = None,
+                ngram_index: Optional[NgramIndex] = None,
+                base_name_index: Optional[Dict[str, List[Tuple[str, str]]]] = None) -> Tuple[List[Tuple[str, str, float]], str]:
+    """
+    Tiered drug lookup. Tries, in order, and stops at the first tier that answers:
+        "exact" - the query is a key of drug_map
+        "alias" - the query is an alias in alias_index (if provided)
+        "base" - the cleaned query, salt kept, is in base_name_index (if provided, see cleaned_name_matches)
+        "normalized" - the normalized query (see normalize.normalized_index_key) is in normalized_index
+                       (if provided)
+        "base" - the query, or every component of a combination product, is in base_name_index
+                 (if provided, see base_name_matches). Combination products return one result per component.
+        "fuzzy" - fuzzy_search_drug with the given method
+    
+    Args:
+        query (str): The drug name to search for
+        drug_map (dict): Dictionary mapping drug names to drugbank ids
+        method (str): The matching method used by the fuzzy tier
+        threshold (float): Minimum similarity score (0-100) for fuzzy matches
+        max_results (int): Maximum number of results to return
+        normalized_index (dict, optional): Index built with normalize.build_normalized_index(drug_map)
+        alias_index (dict, optional): Alias index as returned by load_alias_index
+        ngram_index (NgramIndex, optional): N-gram index used by the fuzzy tier
+        base_name_index (dict, optional): Base-name index as returned by load_base_name_index
+    
+    Returns:
+        tuple: (results, tier) where results is a list of (drug_name, drugbank_id, similarity_score)
+               tuples and tier is the name of the tier that answered
+    """
+    query = query.lower().strip()
+    if query in drug_map:
+        return [(query, drug_map[query], 100.0)], "exact"
+    if alias_index is not None:
+        results = alias_matches(query, alias_index, max_results)
+        if results:
+            return results, "alias"
+    if base_name_index is not None:
+        results = cleaned_name_matches(query, base_name_index, max_results)
+        if results:
+            return results, "base"
+    if normalized_index is not None:
+        drug_name = normalized_index.get(normalized_index_key(query))
+        if drug_name is not None:
+            return [(drug_name, drug_map[drug_name], 100.0)], "normalized"
+    if base_name_index is not None:
+        results = base_name_matches(query, base_name_index, max_results)
+        if results:
+            return results, "base"
+    return fuzzy_search_drug(query, drug_map, method, threshold, max_results, ngram_index=ngram_index), "fuzzy"
+
+class DrugMatcher:
+    """
+    Reusable fuzzy matching engine over a drug name to id map.
+
+    Normalized, tokenized and token-sorted forms of every drug name are computed once
+    when the matcher is built, so repeated searches only pay for processing the query.
+    """
+
+    def __init__(self, drug_map: Dict[str, str],
+                 alias_index: Optional[Dict[str, List[Tuple[str, str]]]] = None,
+                 base_name_index: Optional[Dict[str, List[Tuple[str, str]]]] = None):
+        """
+        Args:
+            drug_map (dict): Dictionary mapping drug names to drugbank ids, as returned by
+                             load_drug_name_map
+            alias_index (dict, optional): Alias index as returned by load_alias_index. If provided,
+                                          exact alias hits are answered before any fuzzy scoring.
+            base_name_index (dict, optional): Base-name index as returned by load_base_name_index, used
+                                              by lookup. If None, one is built from drug_map (and alias_index).
+        """
+        self.drug_map = drug_map
+        self.alias_index = alias_index
+        self.names = tuple(drug_map.keys())
+        self.ids = tuple(drug_map[drug_name] for drug_name in self.names)
+        self.normalized_names = tuple(drug_name.lower().strip() for drug_name in self.names)
+        self.tokens = tuple(tuple(drug_name.split()) for drug_name in self.normalized_names)
+        self.sorted_names = tuple(" ".join(sorted(tokens)) for tokens in self.tokens)
+        self.normalized_positions = {}
+        for idx, normalized_name in enumerate(self.normalized_names):
+            self.normalized_positions.setdefault(normalized_name, idx)
+        self.normalized_names_by_length = group_by_length(self.normalized_names)
+        self.length_index = LengthBucketIndex(self.names, [_token_sort_form(drug_name) for drug_name in self.names])
+        self.normalized_index = build_normalized_index(drug_map)
+        if base_name_index is None:
+            base_name_index = build_base_name_index(drug_map, alias_index)
+        self.base_name_index = base_name_index
+        # Built on first use by the methods that need them
+        self._ngram_index: Optional[NgramIndex] = None
+        self._suffix_array: Optional[SuffixArray] = None
+        self._bk_tree: Optional[BKTree] = None
+        self._prefix_index: Optional[PrefixIndex] = None
+        self._phonetic_index: Optional[PhoneticIndex] = None
+        logger.info(f"Built drug matcher over {len(self.names)} names")
+
+    @property
+    def ngram_index(self) -> NgramIndex:
+        """N-gram index over the names, used by the "fuzzywuzzy" method at low thresholds."""
+        if self._ngram_index is None:
+            self._ngram_index = NgramIndex(self.drug_map, sorted_names=self.sorted_names)
+        return self._ngram_index
+
+    @property
+    def suffix_array(self) -> SuffixArray:
+        """Suffix array over the names, used by the "regex" method."""
+        if self._suffix_array is None:
+            self._suffix_array = SuffixArray(list(self.names))
+        return self._suffix_array
+
+    @property
+    def bk_tree(self) -> BKTree:
+        """BK-tree over the names, used by the "edit" method."""
+        if self._bk_tree is None:
+            self._bk_tree = BKTree(self.names)
+        return self._bk_tree
+
+    @property
+    def prefix_index(self) -> PrefixIndex:
+        """Prefix completion index over the names, used by complete."""
+        if self._prefix_index is None:
+            self._prefix_index = PrefixIndex(self.drug_map)
+        return self._prefix_index
+
+    @property
+    def phonetic_index(self) -> PhoneticIndex:
+        """Phonetic index over the names (the saved one if it matches), used by the "phonetic" method."""
+        if self._phonetic_index is None:
+            self._phonetic_index = _load_or_build_phonetic_index(self.drug_map)
+        return self._phonetic_index
+
+    def search(self, query: str,
+               method: str = "fuzzywuzzy",
+               threshold: float = 70.0,
+               max_results: int = 5) -> List[Tuple[str, str, float]]:
+        """
+        Search for a drug name using fuzzy matching. Same methods and output as fuzzy_search_drug.
+
+        Args:
+            query (str): The drug name to search for
+            method (str): The matching method to use ("fuzzywuzzy", "difflib", "regex", "edit", "phonetic"
+                          or "sqlite")
+            threshold (float): Minimum similarity score (0-100) for matches to be returned
+            max_results (int): Maximum number of results to return
+
+        Returns:
+            list: List of tuples containing (drug_name, drugbank_id, similarity_score)
+        """
+        query = query.lower().strip()
+        if self.alias_index is not None:
+            results = alias_matches(query, self.alias_index, max_results)
+            if results:
+                return results
+        results = []
+
+        if method == "fuzzywuzzy":
+            if threshold < NGRAM_SHORTLIST_MAX_THRESHOLD:
+                results = _shortlisted_token_sort_search(query, self.ngram_index, self.length_index,
+                                                         self.drug_map, threshold, max_results)
+            else:
+                results = _token_sort_search(query, self.length_index, self.drug_map, threshold, max_results)
+
+        elif method == "difflib":
+            # Score the normalized names and map them back by position
+            for ratio, normalized_name in _difflib_top_k(query, self.normalized_names_by_length, max_results, threshold/100):
+                idx = self.normalized_positions[normalized_name]
+                results.append((self.names[idx], self.ids[idx], ratio * 100))
+
+        elif method == "regex":
+            results = _substring_search(query, self.suffix_array, self.drug_map, threshold, max_results)
+
+        elif method == "edit":
+            results = _edit_search(query, self.bk_tree, self.drug_map, threshold, max_results)
+
+        elif method == "phonetic":
+            results = _phonetic_search(query, self.phonetic_index, self.drug_map, threshold, max_results)
+
+        elif method == "sqlite":
+            results = _sqlite_search(query, get_sqlite_index(), threshold, max_results)
+
+        else:
+            raise ValueError(f"Unknown method: {method}. Choose from 'fuzzywuzzy', 'difflib', 'regex', 'edit', "
+                             "'phonetic' or 'sqlite'")
+
+        results.sort(key=lambda x: x[2], reverse=True)
+        if not results:
+            return [('', '', 0.0)]
+        return results
+
+    def lookup(self, query: str,
+               method: str = "fuzzywuzzy",
+               threshold: float = 70.0,
+               max_results: int = 5) -> Tuple[List[Tuple[str, str, float]], str]:
+        """
+        Tiered lookup (exact, alias, cleaned base, normalized, base, then fuzzy), see lookup_drug.
+
+        Args:
+            query (str): The drug name to search for
+            method (str): The matching method used by the fuzzy tier
+            threshold (float): Minimum similarity score (0-100) for fuzzy matches
+            max_results (int): Maximum number of results to return
+
+        Returns:
+            tuple: (results, tier) where tier is "exact", "alias", "normalized", "base" or "fuzzy"
+        """
+        normalized_query = query.lower().strip()
+        if normalized_query in self.drug_map:
+            return [(normalized_query, self.drug_map[normalized_query], 100.0)], "exact"
+        if self.alias_index is not None:
+            results = alias_matches(normalized_query, self.alias_index, max_results)
+            if results:
+                return results, "alias"
+        results = cleaned_name_matches(normalized_query, self.base_name_index, max_results)
+        if results:
+            return results, "base"
+        drug_name = self.normalized_index.get(normalized_index_key(normalized_query))
+        if drug_name is not None:
+            return [(drug_name, self.drug_map[drug_name], 100.0)], "normalized"
+        results = base_name_matches(normalized_query, self.base_name_index, max_results)
+        if results:
+            return results, "base"
+        return self.search(query, method, threshold, max_results), "fuzzy"
+
+    def complete(self, prefix: str, k: int = 10) -> List[Tuple[str, str]]:
+        """
+        Autocomplete a drug name prefix, see autocomplete_drug.
+
+        Args:
+            prefix (str): The typed prefix
+            k (int): Maximum number of completions to return
+
+        Returns:
+            list: (drug_name, drugbank_id) tuples, best first
+        """
+        return self.prefix_index.complete(prefix, k)
+
+    def search_many(self, queries: Iterable[str],
+                    method: str = "fuzzywuzzy",
+                    threshold: float = 70.0,
+                    max_results: int = 5) -> List[List[Tuple[str, str, float]]]:
+        """
+        Search for several drug names, reusing the precomputed name forms for every query.
+
+        Args:
+            queries (iterable): The drug names to search for
+            method (str): The matching method to use
+            threshold (float): Minimum similarity score (0-100) for matches
+            max_results (int): Maximum number of results to return per query
+
+        Returns:
+            list: One list of (drug_name, drugbank_id, similarity_score) tuples per query, in input order
+        """
+        return [self.search(query, method, threshold, max_results) for query in queries]
+
+def bulk_score_matrix(queries: Sequence[str],
+                      drug_names: Sequence[str],
+                      score_cutoff: float = 0.0,
+                      workers: int = -1) -> "np.ndarray":
+    """
+    Score every query against every drug name with token_sort_ratio in native code
+    (rapidfuzz's cdist). Strings are processed as fuzzywuzzy's process.extract processes them.
+
+    Args:
+        queries (sequence): N drug names to search for
+        drug_names (sequence): M drug names to score against
+        score_cutoff (float): Rounded scores below this value are set to 0
+        workers (int): Number of threads used by cdist. -1 uses all cores.
+
+    Returns:
+        np.ndarray: N x M matrix of similarity scores (0-100), rounded to integers like fuzzywuzzy
+    """
+    if not RAPIDFUZZ_AVAILABLE:
+        raise ImportError("bulk_score_matrix requires rapidfuzz and numpy")
+    return _sorted_cdist([_token_sort_query_form(query) for query in queries],
+                         [_token_sort_form(drug_name) for drug_name in drug_names],
+                         score_cutoff, workers)
+
+def _sorted_cdist(processed_queries: List[str],
+                  processed_names: List[str],
+                  score_cutoff: float,
+                  workers: int) -> "np.ndarray":
+    """
+    Run cdist with a plain ratio over strings already processed with _token_sort_query_form and
+    _token_sort_form. Scores are rounded before the cutoff is applied, as fuzzywuzzy rounds before
+    comparing with a threshold, and an empty string scores 0 like in fuzz.ratio.
+    """
+    scores = rf_process.cdist(processed_queries, processed_names,
+                              scorer=rf_fuzz.ratio,
+                              score_cutoff=None,
+                              dtype=np.float64,
+                              workers=workers)
+    scores = np.rint(scores)
+    scores[scores < score_cutoff] = 0
+    scores[[not query for query in processed_queries], :] = 0
+    scores[:, [not name for name in processed_names]] = 0
+    return scores
+
+def top_k_indices(scores: "np.ndarray", k: int, threshold: float = 0.0) -> List[List[int]]:
+    """
+    Select the k best-scoring columns of each row of a score matrix.
+
+    Args:
+        scores (np.ndarray): N x M score matrix, e.g. from bulk_score_matrix
+        k (int): Maximum number of columns to select per row
+        threshold (float): Minimum score for a column to be selected
+
+    Returns:
+        list: For each row, column indices sorted by descending score. Ties keep column order,
+              like fuzzywuzzy's process.extract.
+    """
+    k = min(k, scores.shape[1])
+    if k <= 0:
+        return [[] for _ in range(scores.shape[0])]
+    top = []
+    for row in scores:
+        kth_best = np.partition(row, row.shape[0] - k)[row.shape[0] - k]
+        idx = np.flatnonzero(row >= max(kth_best, threshold))
+        idx = idx[np.lexsort((idx, -row[idx]))][:k]
+        top.append(idx.tolist())
+    return top
+
+def fuzzy_search_many(queries: Sequence[str],
+                      drug_map: Dict[str, str],
+                      threshold: float = 70.0,
+                      max_results: int = 5,
+                      workers: int = -1,
+                      block_size: int = 256) -> List[List[Tuple[str, str, float]]]:
+    """
+    Search for many drug names at once with token_sort_ratio. Queries are scored in blocks
+    against all drug names with bulk_score_matrix, so the per-pair work runs in native code
+    instead of the interpreter. Falls back to DrugMatcher.search_many if rapidfuzz is not installed.
+
+    Args:
+        queries (sequence): The drug names to search for
+        drug_map (dict): Dictionary mapping drug names to drugbank ids
+        threshold (float): Minimum similarity score (0-100) for matches to be returned
+        max_results (int): Maximum number of results to return per query
+        workers (int): Number of threads used for scoring. -1 uses all cores.
+        block_size (int): Number of queries scored per matrix, to bound memory use
+
+    Returns:
+        list: One list of (drug_name, drugbank_id, similarity_score) tuples per query, in input order
+    """
+    if not RAPIDFUZZ_AVAILABLE:
+        logger.warning("rapidfuzz is not installed, scoring queries one at a time")
+        return DrugMatcher(drug_map).search_many(queries, "fuzzywuzzy", threshold, max_results)
+
+    queries = [query.lower().strip() for query in queries]
+    length_index = get_length_index(drug_map)
+    drug_names = length_index.names
+    processed_names = length_index.processed_names
+    all_results = []
+    for start in range(0, len(queries), block_size):
+        block = [_token_sort_query_form(query) for query in queries[start:start + block_size]]
+        scores = _sorted_cdist(block, processed_names, threshold, workers)
+        for row, top in zip(scores, top_k_indices(scores, max_results, threshold)):
+            results = [(drug_names[idx], drug_map[drug_names[idx]], float(row[idx])) for idx in top]
+            all_results.append(results if results else [('', '', 0.0)])
+    return all_results
+
+class _LoadedMap:
+    """A drug map loaded by get_drug_map, with the file state it was loaded from and its derived indexes."""
+
+    def __init__(self, filepath: str, is_default: bool = False, manifest_mtime_ns: Optional[int] = None):
+        self.filepath = filepath
+        # The default map follows the latest build, which the saved_outputs manifest points to
+        self.is_default = is_default
+        self.manifest_mtime_ns = manifest_mtime_ns
+        stat = os.stat(filepath)
+        self.mtime_ns = stat.st_mtime_ns
+        self.size = stat.st_size
+        self.sha256 = file_sha256(filepath)
+        self.drug_map = load_drug_name_map(filepath)
+        self.matcher: Optional[DrugMatcher] = None
+
+# Maps loaded by get_drug_map, keyed by the filepath argument (None for the default map)
+_loaded_maps: Dict[Optional[str], _LoadedMap] = {}
+_loaded_maps_lock = threading.Lock()
+
+def _manifest_mtime_ns() -> Optional[int]:
+    """Modification time of the saved_outputs manifest, or None if there is none."""
+    try:
+        return os.stat(get_artifact_store().manifest_path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+def _is_current(loaded: _LoadedMap) -> bool:
+    """
+    Check whether a loaded map still reflects its file, and for the default map whether it is
+    still the latest build. A changed mtime or size only triggers a reload if the file's hash
+    changed too; a changed manifest only if it now points to another file.
+    """
+    if loaded.is_default:
+        manifest_mtime_ns = _manifest_mtime_ns()
+        if manifest_mtime_ns != loaded.manifest_mtime_ns:
+            try:
+                if _resolve_default_map_path() != loaded.filepath:
+                    return False
+            except FileNotFoundError:
+                pass
+            loaded.manifest_mtime_ns = manifest_mtime_ns
+    try:
+        stat = os.stat(loaded.filepath)
+    except FileNotFoundError:
+        return False
+    if stat.st_mtime_ns == loaded.mtime_ns and stat.st_size == loaded.size:
+        return True
+    if file_sha256(loaded.filepath) != loaded.sha256:
+        return False
+    loaded.mtime_ns = stat.st_mtime_ns
+    loaded.size = stat.st_size
+    return True
+
+def _get_loaded_map(filepath: Optional[str]) -> _LoadedMap:
+    """Get the process-wide loaded map for filepath, loading or reloading it if needed."""
+    loaded = _loaded_maps.get(filepath)
+    if loaded is not None and _is_current(loaded):
+        return loaded
+    with _loaded_maps_lock:
+        # Another thread may have reloaded it while we waited for the lock
+        loaded = _loaded_maps.get(filepath)
+        if loaded is not None and _is_current(loaded):
+            return loaded
+        if loaded is not None:
+            logger.info(f"{loaded.filepath} changed or was superseded, reloading drug map")
+        if filepath is None:
+            # Read the manifest's mtime first, so a build saved while resolving is seen on the next call
+            manifest_mtime_ns = _manifest_mtime_ns()
+            loaded = _LoadedMap(_resolve_default_map_path(), True, manifest_mtime_ns)
+        else:
+            loaded = _LoadedMap(filepath)
+        _loaded_maps[filepath] = loaded
+        return loaded
+
+def _resolve_default_map_path() -> str:
+    """Path of the map load_drug_name_map loads when no filepath is given."""
+    try:
+        filepath = find_latest_saved_output('drugbank_name_to_id', BINARY_INDEX_EXTENSION)
+        if has_current_format(filepath):
+            return filepath
+        logger.warning(f"{filepath} was written in an older binary index format, loading the pickle instead")
+    except FileNotFoundError:
+        pass
+    return find_latest_saved_output('drugbank_name_to_id')
+
+def get_drug_map(filepath: Optional[str] = None) -> Dict[str, str]:
+    """
+    Get the drug map, loading it at most once per process. Safe to call from several threads
+    and cheap enough for hot loops: after the first load, each call only stats the file. The map
+    is reloaded when the file's mtime changes and its hash differs from the loaded one.
+    
+    Args:
+        filepath (str, optional): Path to the map file. If None, the most recent map in saved_outputs
+                                  is resolved on first use (see load_drug_name_map) and replaced once the
+                                  saved_outputs manifest points to a newer build.
+    
+    Returns:
+        dict: A dictionary (or MmapDrugIndex) mapping drug names to drugbank ids
+    """
+    return _get_loaded_map(filepath).drug_map
+
+def get_drug_matcher(filepath: Optional[str] = None) -> DrugMatcher:
+    """
+    Get a DrugMatcher over the map returned by get_drug_map, built once per loaded map.
+    
+    Args:
+        filepath (str, optional): Path to the map file, see get_drug_map
+    
+    Returns:
+        DrugMatcher: The matcher, rebuilt whenever the map is reloaded
+    """
+    loaded = _get_loaded_map(filepath)
+    if loaded.matcher is None:
+        with _loaded_maps_lock:
+            if loaded.matcher is None:
+                loaded.matcher = DrugMatcher(loaded.drug_map)
+    return loaded.matcher
+
+def clear_drug_map_cache():
+    """Drop every map loaded by get_drug_map, so the next call resolves and loads the file again."""
+    with _loaded_maps_lock:
+        _loaded_maps.clear()
+
+def _hash_drug_map(drug_map: Dict[str, str]) -> str:
+    """Hash a drug map's items, in iteration order."""
+    digest = hashlib.sha1()
+    for drug_name, drugbank_id in drug_map.items():
+        digest.update(f"{drug_name}\0{drugbank_id}\0".encode('utf-8'))
+    return f"dict-{digest.hexdigest()[:16]}"
+
+def get_index_version(drug_map: Dict[str, str]) -> str:
+    """
+    Get an identifier of a drug map's contents, used to key cached search results.
+    
+    Args:
+        drug_map (dict): Dictionary (or MmapDrugIndex) mapping drug names to drugbank ids
+    
+    Returns:
+        str: The index_version of an MmapDrugIndex, or a hash of a dict's items (computed once per dict)
+    """
+    version = getattr(drug_map, 'index_version', None)
+    if version is not None:
+        return version
+    return get_derived_index(drug_map, "index_version", _hash_drug_map)
+
+# Versions computed by get_alias_index_version, keyed by id(alias_index). The index is kept in the
+# entry so its id cannot be reused by another object while cached.
+_alias_index_versions: Dict[int, Tuple[Dict[str, List[Tuple[str, str]]], str]] = {}
+
+def get_alias_index_version(alias_index: Dict[str, List[Tuple[str, str]]]) -> str:
+    """
+    Get an identifier of an alias index's contents, used to key cached search results. It is
+    hashed once per index object, as alias indexes are not edited once loaded.
+    
+    Args:
+        alias_index (dict): Alias index as returned by load_alias_index
+    
+    Returns:
+        str: A hash of the index's aliases and their (drugbank_id, alias_type) entries
+    """
+    cached = _alias_index_versions.get(id(alias_index))
+    if cached is not None and cached[0] is alias_index:
+        return cached[1]
+    digest = hashlib.sha1()
+    for alias, entries in alias_index.items():
+        digest.update(f"{alias}\0".encode('utf-8'))
+        for drugbank_id, alias_type in entries:
+            digest.update(f"{drugbank_id}\1{alias_type}\1".encode('utf-8'))
+    version = f"aliases-{digest.hexdigest()[:16]}"
+    if len(_alias_index_versions) >= 8:
+        _alias_index_versions.clear()
+    _alias_index_versions[id(alias_index)] = (alias_index, version)
+    return version
+
+def autocomplete_drug(prefix: str,
+                      drug_map: Optional[Dict[str, str]] = None,
+                      k: int = 10) -> List[Tuple[str, str]]:
+    """
+    Complete a typed drug name prefix, e.g. for a type-ahead box. Completions are found with a binary
+    search over the sorted names and ranked shortest first. Use PrefixIndex directly to rank by popularity.
+    
+    Args:
+        prefix (str): The typed prefix
+        drug_map (dict, optional): Dictionary mapping drug names to drugbank ids. If None, the process-wide
+                                   DrugMatcher from get_drug_matcher is used.
+        k (int): Maximum number of completions to return
+    
+    Returns:
+        list: (drug_name, drugbank_id) tuples, best first
+    """
+    if drug_map is None:
+        return get_drug_matcher().complete(prefix, k)
+    return get_prefix_index(drug_map).complete(prefix, k)
+
 def search_drug(query: str, 
                 drug_map: Optional[Dict[str, str]] = None,
                 method: str = "fuzzywuzzy",
                 threshold: float = 70.0,
-                max_results: int = 5) -> List[Tuple[str, str, float]]:
+                max_results: int = 5,
+                alias_index: Optional[Dict[str, List[Tuple[str, str]]]] = None,
+                cache: Optional[QueryCache] = None) -> List[Tuple[str, str, float]]:
     """
     Convenience function that loads the drug map if not provided and performs a fuzzy search.
     
     Args:
         query (str): The drug name to search for
-        drug_map (dict, optional): Dictionary mapping drug names to drugbank ids. If None, will load it.
+        drug_map (dict, optional): Dictionary mapping drug names to drugbank ids. If None, the process-wide
+                                   map and DrugMatcher from get_drug_map/get_drug_matcher are used, so
+                                   the map is only loaded and indexed once. The "sqlite" method does not
+                                   load the map at all.
         method (str): The matching method to use
         threshold (float): Minimum similarity score (0-100) for matches
         max_results (int): Maximum number of results to return
+        alias_index (dict, optional): Alias index used to answer exact alias hits without fuzzy scoring
+        cache (QueryCache, optional): Cache of search results, keyed on the normalized query, the search
+                                      parameters and the index version of drug_map
     
     Returns:
         list: List of tuples containing (drug_name, drugbank_id, similarity_score)
     """
-    if drug_map is None:
-        drug_map = load_drug_name_map()
+    if method == "sqlite" and drug_map is None and alias_index is None:
+        # Searches the on-disk index only, the map is never loaded
+        sqlite_index = get_sqlite_index()
+        search = partial(fuzzy_search_drug, query, {}, method, threshold, max_results, sqlite_index=sqlite_index)
+    elif drug_map is None and alias_index is None:
+        matcher = get_drug_matcher()
+        drug_map = matcher.drug_map
+        search = partial(matcher.search, query, method, threshold, max_results)
+    else:
+        if drug_map is None:
+            drug_map = get_drug_map()
+        search = partial(fuzzy_search_drug, query, drug_map, method, threshold, max_results, alias_index=alias_index)
     
-    return fuzzy_search_drug(query, drug_map, method, threshold, max_results)
+    if cache is None:
+        return search()
+    
+    if drug_map is None:
+        # The sqlite index file is content-addressed, so its name identifies its contents
+        index_version = f"sqlite-{os.path.basename(sqlite_index.filepath)}"
+    else:
+        index_version = get_index_version(drug_map)
+    if alias_index is not None:
+        index_version += "+" + get_alias_index_version(alias_index)
+    key = make_cache_key(query, method, threshold, max_results, index_version)
+    results = cache.get(key)
+    if results is None:
+        results = search()
+        cache.put(key, results)
+    return results
 
 if __name__ == "__main__":
     # Example usage
@@ -1,8 +1,33 @@
 from lxml import etree
 import pickle
 import os
+import hashlib
+import argparse
+from collections import deque
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple, Iterable
 from loguru import logger
 import tqdm
+from binary_index import write_binary_index, EXTENSION
+from normalize import build_base_name_index
+from phonetic import PhoneticIndex
+from arrow_export import build_drug_table, write_drug_table, PYARROW_AVAILABLE, PARQUET_EXTENSION, ARROW_EXTENSION
+from sqlite_index import write_sqlite_index, EXTENSION as SQLITE_INDEX_EXTENSION
+from fuzzy_search import find_latest_saved_output, get_artifact_store, invalidate_derived_indexes
+
+DRUGBANK_NS = 'http://www.drugbank.ca'
+NS = {'db': DRUGBANK_NS}
+DRUGBANK_TAG = f'{{{DRUGBANK_NS}}}drugbank'
+DRUG_TAG = f'{{{DRUGBANK_NS}}}drug'
+
+# Alias source types and the paths (relative to a drug element) their names are found at
+ALIAS_PATHS = [
+    ('synonym', 'db:synonyms/db:synonym'),
+    ('international-brand', 'db:international-brands/db:international-brand/db:name'),
+    ('product', 'db:products/db:product/db:name'),
+    ('mixture', 'db:mixtures/db:mixture/db:name'),
+]
 
 # Get the path to the src directory
 def get_src_dir():
@@ -17,70 +42,359 @@ def get_src_dir():
     else:
         return os.getcwd()
 
-def iterative_saver(data: dict, filename: str, save_directory: str = "saved_outputs"):
+def read_drugbank_version(xml_path: str) -> Optional[str]:
     """
-    Save the data to a pickle file. If the file exists, add a suffix to the filename.
+    Read the release version (the root element's version attribute) of a drugbank xml file.
+    Only the opening tag of the root element is parsed.
     """
+    for event, elem in etree.iterparse(xml_path, events=('start',)):
+        return elem.get('version')
+    return None
 
-    src_dir = get_src_dir()
-    saved_outputs_dir = os.path.join(src_dir, 'saved_outputs')
-    os.makedirs(saved_outputs_dir, exist_ok=True)
-    
-    # Check if the file exists. If it does, add a suffix to the filename
-    if os.path.exists(os.path.join(saved_outputs_dir, f'{filename}.pkl')):
-        suffix = 1
-        while os.path.exists(os.path.join(saved_outputs_dir, f'{filename}_{suffix}.pkl')):
-            suffix += 1
-        output_path = os.path.join(saved_outputs_dir, f'{filename}_{suffix}.pkl')
-        with open(output_path, 'wb') as f:
-            pickle.dump(data, f)
-        logger.info(f"Saved {data} to {output_path}")
-    else:
-        output_path = os.path.join(saved_outputs_dir, f'{filename}.pkl')
-        with open(output_path, 'wb') as f:
-            pickle.dump(data, f)
-        logger.info(f"Saved {filename} to {output_path}")
-        
-def build_drugbank_name_to_id_map(xml_path: str, save_output: bool = True):
-    """
-    Build a map from drug name to drugbank id. Iterate through the XML file and extract the drugbank id and name for each drug.
+def iterative_saver(data: dict, filename: str, release: Optional[str] = None) -> str:
+    """
+    Save the data to a pickle file in the saved_outputs artifact store, as the latest version of filename.
+    """
+    return get_artifact_store().put_pickle(filename, data, release)
+
+def binary_index_saver(name_to_id: dict, filename: str, release: Optional[str] = None) -> str:
+    """
+    Save a drug name to id map in the memory-mappable binary index format (see binary_index)
+    in the saved_outputs artifact store.
+    """
+    return get_artifact_store().put(filename, EXTENSION, partial(write_binary_index, name_to_id), release)
+
+def sqlite_index_saver(name_to_id: dict, alias_index: dict, filename: str, release: Optional[str] = None) -> str:
+    """
+    Save the SQLite search database over the names and aliases (see sqlite_index) in the
+    saved_outputs artifact store.
+    """
+    write = partial(write_sqlite_index, name_to_id, alias_index=alias_index)
+    return get_artifact_store().put(filename, SQLITE_INDEX_EXTENSION, write, release)
+
+def drug_table_saver(drug_records: Iterable[Dict], filename: str, release: Optional[str] = None):
+    """
+    Save the drug name and alias table (see arrow_export) as Parquet and as an Arrow IPC file
+    in the saved_outputs artifact store. Skipped if pyarrow is not installed.
+    """
+    if not PYARROW_AVAILABLE:
+        logger.warning(f"pyarrow is not installed, not saving {filename}")
+        return
+    table = build_drug_table(drug_records)
+    store = get_artifact_store()
+    for extension in (PARQUET_EXTENSION, ARROW_EXTENSION):
+        store.put(filename, extension, partial(write_drug_table, table), release)
+
+def iter_drug_elements(xml_path: str) -> Iterator[etree._Element]:
+    """
+    Stream the top-level drug elements of the drugbank xml file.
+
+    iterparse only reports drug end events, and each drug's preceding siblings are deleted
+    from the root once it has been consumed, so memory stays flat over the whole file.
+    Nested drug elements (e.g. the drugs listed in a pathway) are skipped.
+    Args:
+        xml_path (str): Path to the drugbank xml file
+    Yields:
+        etree._Element: Each top-level drug element. It is cleared once the consumer moves on.
+    """
+    context = etree.iterparse(xml_path, events=('end',), tag=DRUG_TAG)
+    for event, elem in context:
+        parent = elem.getparent()
+        if parent is None or parent.tag != DRUGBANK_TAG:
+            continue
+        yield elem
+        elem.clear(keep_tail=True)
+        while elem.getprevious() is not None:
+            del parent[0]
+    del context
+
+def extract_drug_fields(elem: etree._Element) -> Optional[Dict]:
+    """
+    Extract the fields we index from a drug element.
+    Args:
+        elem (etree._Element): A top-level drug element
+    Returns:
+        dict: The drug's 'drugbank_id', lowercased 'name', 'aliases' (a list of unique
+              (lowercased alias, alias type) tuples), 'groups' (e.g. ["approved", "withdrawn"])
+              and 'atc_codes', or None if the id or name is missing
+    """
+    drugbank_id = elem.find('db:drugbank-id', NS)
+    name = elem.find('db:name', NS)
+    if drugbank_id is None or name is None or name.text is None:
+        return None
+    aliases = []
+    seen = set()
+    for alias_type, path in ALIAS_PATHS:
+        for alias_elem in elem.iterfind(path, NS):
+            if alias_elem.text is None:
+                continue
+            alias = alias_elem.text.strip().lower()
+            if alias and (alias, alias_type) not in seen:
+                seen.add((alias, alias_type))
+                aliases.append((alias, alias_type))
+    groups = [group.text.strip() for group in elem.iterfind('db:groups/db:group', NS) if group.text]
+    atc_codes = [atc_code.get('code') for atc_code in elem.iterfind('db:atc-codes/db:atc-code', NS)
+                 if atc_code.get('code')]
+    return {'drugbank_id': drugbank_id.text, 'name': name.text.lower(), 'aliases': aliases,
+            'groups': groups, 'atc_codes': atc_codes}
+
+def _extract_serialized_drugs(chunk: List[bytes]) -> List[Optional[Dict]]:
+    """Parse serialized drug elements and extract their fields (runs in a worker process)."""
+    return [extract_drug_fields(etree.fromstring(xml_bytes)) for xml_bytes in chunk]
+
+def iter_drug_records(xml_path: str, n_workers: int = 0, chunk_size: int = 200) -> Iterator[Dict]:
+    """
+    Stream the extracted fields of every top-level drug in the drugbank xml file, in file order.
+    Args:
+        xml_path (str): Path to the drugbank xml file
+        n_workers (int, optional): Number of worker processes used for field extraction. With 0,
+                                   fields are extracted in the parsing process. Defaults to 0.
+        chunk_size (int, optional): Number of serialized drugs sent to a worker at once. Defaults to 200.
+    Yields:
+        dict: The fields returned by extract_drug_fields for each drug
+    """
+    if n_workers <= 0:
+        for elem in tqdm.tqdm(iter_drug_elements(xml_path)):
+            record = extract_drug_fields(elem)
+            if record is not None:
+                yield record
+        return
+
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        # Keep a bounded number of chunks in flight so memory stays flat
+        pending = deque()
+        chunk = []
+        for elem in tqdm.tqdm(iter_drug_elements(xml_path)):
+            chunk.append(etree.tostring(elem))
+            if len(chunk) == chunk_size:
+                pending.append(executor.submit(_extract_serialized_drugs, chunk))
+                chunk = []
+                if len(pending) >= 2 * n_workers:
+                    yield from (r for r in pending.popleft().result() if r is not None)
+        if chunk:
+            pending.append(executor.submit(_extract_serialized_drugs, chunk))
+        while pending:
+            yield from (r for r in pending.popleft().result() if r is not None)
+
+def build_drugbank_name_to_id_map(xml_path: str, save_output: bool = True, n_workers: int = 0):
+    """
+    Build a map from drug name to drugbank id. Stream the top-level drugs of the XML file and extract the drugbank id and name for each drug.
     Args:
         xml_path (str): Path to the drugbank xml file
         save_output (bool, optional): Whether to save the output to a pickle file. Defaults to True.
+        n_workers (int, optional): Number of worker processes used for field extraction. Defaults to 0 (no pool).
     Returns:
         dict: A dictionary mapping drug names to drugbank ids
     """
     logger.info(f"Building drug name to id map from {xml_path}")
-    ns = {'db': 'http://www.drugbank.ca'}
     name_to_id = {}
-
-    # Iterate through the tree
-    context = etree.iterparse(xml_path, events=('end',))
-    for event, elem in tqdm.tqdm(context):
-        if elem.tag == '{http://www.drugbank.ca}drug':
-            # Get the drugbank id
-            drugbank_id = elem.find('db:drugbank-id', ns)
-            if drugbank_id is not None:
-                # Get the name
-                name = elem.find('db:name', ns)
-                if name is not None:
-                    name_to_id[name.text.lower()] = drugbank_id.text
-            elem.clear()
+    for record in iter_drug_records(xml_path, n_workers=n_workers):
+        name_to_id[record['name']] = record['drugbank_id']
     logger.info(f"Built drug name to id map with {len(name_to_id)} entries")
 
     # Save the map to a pickle file
     if save_output:
-        iterative_saver(name_to_id, 'drugbank_name_to_id')
+        release = read_drugbank_version(xml_path)
+        iterative_saver(name_to_id, 'drugbank_name_to_id', release)
+        binary_index_saver(name_to_id, 'drugbank_name_to_id', release)
 
     return name_to_id
 
 
 
-def reverse_drugbank_name_to_id_map(name_to_id: dict, save_output: bool = True):
+def add_to_alias_index(alias_index: Dict[str, List[Tuple[str, str]]], record: Dict):
+    """
+    Add a drug's primary name and aliases to an alias index.
+    Args:
+        alias_index (dict): Maps each alias to a list of unique (drugbank id, alias type) tuples.
+                            The primary name is recorded with the 'name' alias type.
+        record (dict): Drug fields returned by extract_drug_fields
+    """
+    drugbank_id = record['drugbank_id']
+    for alias, alias_type in [(record['name'], 'name')] + record['aliases']:
+        entries = alias_index.setdefault(alias, [])
+        if (drugbank_id, alias_type) not in entries:
+            entries.append((drugbank_id, alias_type))
+
+def remove_from_alias_index(alias_index: Dict[str, List[Tuple[str, str]]], record: Dict):
+    """
+    Remove a drug's primary name and aliases (as recorded by add_to_alias_index) from an alias index.
+    Args:
+        alias_index (dict): Maps each alias to a list of unique (drugbank id, alias type) tuples
+        record (dict): Drug fields the drug was added with
+    """
+    drugbank_id = record['drugbank_id']
+    for alias, alias_type in [(record['name'], 'name')] + record['aliases']:
+        entries = alias_index.get(alias)
+        if entries is None:
+            continue
+        if (drugbank_id, alias_type) in entries:
+            entries.remove((drugbank_id, alias_type))
+        if not entries:
+            del alias_index[alias]
+
+def fingerprint_drug(record: Dict) -> str:
+    """
+    Fingerprint the extracted fields of a drug, to detect drugs that changed between releases.
+    Args:
+        record (dict): Drug fields returned by extract_drug_fields
+    Returns:
+        str: sha1 hex digest of the drugbank id, name, sorted aliases, groups and ATC codes
+    """
+    digest = hashlib.sha1()
+    digest.update(record['drugbank_id'].encode('utf-8'))
+    digest.update(b'\0' + record['name'].encode('utf-8'))
+    for alias, alias_type in sorted(record['aliases']):
+        digest.update(b'\0' + alias.encode('utf-8') + b'\1' + alias_type.encode('utf-8'))
+    for field in ('groups', 'atc_codes'):
+        digest.update(b'\2' + '\0'.join(sorted(record.get(field, []))).encode('utf-8'))
+    return digest.hexdigest()
+
+def build_drugbank_maps(xml_path: str, save_output: bool = True, n_workers: int = 0) -> Tuple[dict, dict]:
+    """
+    Build the drug name to id map and the alias index in a single pass over the XML file.
+    Args:
+        xml_path (str): Path to the drugbank xml file
+        save_output (bool, optional): Whether to save the outputs to pickle files, along with the base-name
+                                      index, the phonetic index and the SQLite index derived from them. Defaults to True.
+        n_workers (int, optional): Number of worker processes used for field extraction. Defaults to 0 (no pool).
+    Returns:
+        tuple: (name_to_id, alias_index). alias_index maps every primary name, synonym, international
+               brand, product name and mixture name to a list of (drugbank id, alias type) tuples.
+    """
+    logger.info(f"Building drug name to id map and alias index from {xml_path}")
+    name_to_id = {}
+    alias_index = {}
+    drug_records = {}
+    for record in iter_drug_records(xml_path, n_workers=n_workers):
+        name_to_id[record['name']] = record['drugbank_id']
+        add_to_alias_index(alias_index, record)
+        drug_records[record['drugbank_id']] = dict(record, fingerprint=fingerprint_drug(record))
+    logger.info(f"Built drug name to id map with {len(name_to_id)} entries and alias index with {len(alias_index)} aliases")
+
+    if save_output:
+        release = read_drugbank_version(xml_path)
+        iterative_saver(name_to_id, 'drugbank_name_to_id', release)
+        binary_index_saver(name_to_id, 'drugbank_name_to_id', release)
+        iterative_saver(alias_index, 'drugbank_alias_index', release)
+        iterative_saver(build_base_name_index(name_to_id, alias_index), 'drugbank_base_name_index', release)
+        iterative_saver(PhoneticIndex(name_to_id), 'drugbank_phonetic_index', release)
+        sqlite_index_saver(name_to_id, alias_index, 'drugbank_sqlite_index', release)
+        # Per-drug fields and fingerprints, the baseline for incremental updates
+        iterative_saver(drug_records, 'drugbank_drug_records', release)
+        drug_table_saver(drug_records.values(), 'drugbank_drug_table', release)
+
+    return name_to_id, alias_index
+
+def apply_release_diff(xml_path: str,
+                       name_to_id: dict,
+                       alias_index: dict,
+                       drug_records: dict,
+                       n_workers: int = 0) -> List[Dict]:
+    """
+    Update the maps built from a previous DrugBank release in place to match a new release. Drugs whose
+    fingerprint did not change are left alone; only added, removed, renamed and otherwise changed drugs
+    are applied.
+    Args:
+        xml_path (str): Path to the new release's drugbank xml file
+        name_to_id (dict): Drug name to id map of the previous release
+        alias_index (dict): Alias index of the previous release
+        drug_records (dict): Per-drug fields and fingerprints of the previous release, keyed by drugbank id
+        n_workers (int, optional): Number of worker processes used for field extraction. Defaults to 0 (no pool).
+    Returns:
+        list: Changelog entries, dicts with 'change' ('added', 'removed', 'renamed' or 'updated'),
+              'drugbank_id', 'old_name' and 'new_name'
+    """
+    changelog = []
+    seen = set()
+
+    def remove(old):
+        remove_from_alias_index(alias_index, old)
+        if name_to_id.get(old['name']) == old['drugbank_id']:
+            # Another drug may share the primary name; like a full build, the last one listed keeps it
+            holders = [drugbank_id for drugbank_id, alias_type in alias_index.get(old['name'], ())
+                       if alias_type == 'name']
+            if holders:
+                name_to_id[old['name']] = holders[-1]
+            else:
+                del name_to_id[old['name']]
+
+    for record in iter_drug_records(xml_path, n_workers=n_workers):
+        drugbank_id = record['drugbank_id']
+        seen.add(drugbank_id)
+        fingerprint = fingerprint_drug(record)
+        old = drug_records.get(drugbank_id)
+        if old is not None and old['fingerprint'] == fingerprint:
+            continue
+        if old is None:
+            change = 'added'
+        else:
+            change = 'renamed' if old['name'] != record['name'] else 'updated'
+            remove(old)
+        name_to_id[record['name']] = drugbank_id
+        add_to_alias_index(alias_index, record)
+        drug_records[drugbank_id] = dict(record, fingerprint=fingerprint)
+        changelog.append({'change': change, 'drugbank_id': drugbank_id,
+                          'old_name': old['name'] if old is not None else None, 'new_name': record['name']})
+
+    for drugbank_id in [drugbank_id for drugbank_id in drug_records if drugbank_id not in seen]:
+        old = drug_records.pop(drugbank_id)
+        remove(old)
+        changelog.append({'change': 'removed', 'drugbank_id': drugbank_id, 'old_name': old['name'], 'new_name': None})
+
+    # Renames keep the map's size, so indexes cached for it would go stale
+    invalidate_derived_indexes(name_to_id)
+    invalidate_derived_indexes(alias_index)
+    counts = {change: sum(1 for entry in changelog if entry['change'] == change)
+              for change in ('added', 'removed', 'renamed', 'updated')}
+    logger.info(f"Applied release diff: {counts}")
+    return changelog
+
+def build_drugbank_maps_incremental(xml_path: str, save_output: bool = True, n_workers: int = 0) -> Tuple[dict, dict, List[Dict]]:
+    """
+    Refresh the most recently saved maps from a new DrugBank release with apply_release_diff, instead of
+    rebuilding them from scratch. Requires the outputs of a previous build_drugbank_maps run.
+    Args:
+        xml_path (str): Path to the new release's drugbank xml file
+        save_output (bool, optional): Whether to save the updated maps and the changelog. Defaults to True.
+        n_workers (int, optional): Number of worker processes used for field extraction. Defaults to 0 (no pool).
+    Returns:
+        tuple: (name_to_id, alias_index, changelog)
+    """
+    previous = {}
+    for name in ('drugbank_name_to_id', 'drugbank_alias_index', 'drugbank_drug_records'):
+        filepath = find_latest_saved_output(name)
+        logger.info(f"Loading previous {name} from {filepath}")
+        with open(filepath, 'rb') as f:
+            previous[name] = pickle.load(f)
+    name_to_id = previous['drugbank_name_to_id']
+    alias_index = previous['drugbank_alias_index']
+    drug_records = previous['drugbank_drug_records']
+
+    changelog = apply_release_diff(xml_path, name_to_id, alias_index, drug_records, n_workers=n_workers)
+
+    if save_output:
+        release = read_drugbank_version(xml_path)
+        iterative_saver(name_to_id, 'drugbank_name_to_id', release)
+        binary_index_saver(name_to_id, 'drugbank_name_to_id', release)
+        iterative_saver(alias_index, 'drugbank_alias_index', release)
+        # Rebuilt from the updated maps, it takes a fraction of the time of parsing
+        iterative_saver(build_base_name_index(name_to_id, alias_index), 'drugbank_base_name_index', release)
+        iterative_saver(PhoneticIndex(name_to_id), 'drugbank_phonetic_index', release)
+        sqlite_index_saver(name_to_id, alias_index, 'drugbank_sqlite_index', release)
+        iterative_saver(drug_records, 'drugbank_drug_records', release)
+        drug_table_saver(drug_records.values(), 'drugbank_drug_table', release)
+        changelog_path = get_artifact_store().put_json('drugbank_changelog', changelog, release)
+        logger.info(f"Saved changelog with {len(changelog)} changes to {changelog_path}")
+
+    return name_to_id, alias_index, changelog
+
+def reverse_drugbank_name_to_id_map(name_to_id: dict, save_output: bool = True, release: Optional[str] = None):
     """
     Reverse the drug name to id map.
     Args:
         name_to_id (dict): A dictionary mapping drug names to drugbank ids
+        release (str, optional): DrugBank release the map was built from, recorded with the saved output
     Returns:
         dict: A dictionary mapping drugbank ids to drug names
     """
@@ -88,13 +402,21 @@ def reverse_drugbank_name_to_id_map(name_to_id: dict, save_output: bool = True):
 
     # Save the map to a pickle file
     if save_output:
-        iterative_saver(name_to_id, 'drugbank_id_to_name')
+        iterative_saver(name_to_id, 'drugbank_id_to_name', release)
     return name_to_id
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Build the drug name maps from the drugbank xml file")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Apply only the changes from the previously saved maps instead of rebuilding them")
+    args = parser.parse_args()
+
     # Get the src directory
     src_dir = get_src_dir()
     # Default xml_path to drugbank.xml
     xml_path = os.path.join(src_dir, 'data', 'full_database.xml')
-    name_to_id = build_drugbank_name_to_id_map(xml_path, save_output=True)
-    id_to_name = reverse_drugbank_name_to_id_map(name_to_id, save_output=True)
\ No newline at end of file
+    if args.incremental:
+        name_to_id, alias_index, changelog = build_drugbank_maps_incremental(xml_path, save_output=True, n_workers=os.cpu_count() or 1)
+    else:
+        name_to_id, alias_index = build_drugbank_maps(xml_path, save_output=True, n_workers=os.cpu_count() or 1)
+    id_to_name = reverse_drugbank_name_to_id_map(name_to_id, save_output=True, release=read_drugbank_version(xml_path))
\ No newline at end of file
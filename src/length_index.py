@@ -0,0 +1,91 @@
+"""
+Length-bucketed index of processed drug names, used to skip names that cannot reach a score
+threshold before running the fuzzy scorer.
+
+fuzz.ratio (and so token_sort_ratio, which is ratio over token-sorted forms) scores two strings
+of lengths a and b at most 100 * 2 * min(a, b) / (a + b), and at most 100 * 2 * c / (a + b)
+where c is the number of characters they have in common (as a multiset). Both bounds hold for
+the difflib and the python-Levenshtein backends of fuzzywuzzy.
+"""
+
+from array import array
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Sequence
+
+def max_ratio_score(common: int, total_length: int) -> int:
+    """
+    Upper bound of fuzz.ratio for two strings of total_length characters with at most common
+    characters matched, rounded the way fuzz.ratio rounds its scores.
+    """
+    if total_length == 0:
+        return 100
+    return int(round(100 * (2.0 * common / total_length)))
+
+class LengthBucketIndex:
+    """
+    Processed names bucketed by length, with their character counts. Whole buckets are skipped
+    when their length bound is below the threshold, and the names of the remaining buckets are
+    checked cheapest first: the character-count bound before any scoring.
+    """
+
+    def __init__(self, names: Sequence[str], processed_names: Sequence[str]):
+        """
+        Args:
+            names (sequence): The drug names, in map order
+            processed_names (sequence): The names in the form the scorer compares them (e.g. the
+                                        token-sorted forms for token_sort_ratio), in the same order
+        """
+        self.names = list(names)
+        self.processed_names = list(processed_names)
+        buckets = defaultdict(lambda: array('I'))
+        for idx, processed_name in enumerate(self.processed_names):
+            buckets[len(processed_name)].append(idx)
+        self.buckets: Dict[int, array] = dict(buckets)
+        self.char_counts = [tuple(Counter(processed_name).items()) for processed_name in self.processed_names]
+
+    def _passes_char_bound(self, idx: int, query_counts: Dict[str, int], total_length: int, threshold: float) -> bool:
+        common = 0
+        for char, count in self.char_counts[idx]:
+            query_count = query_counts.get(char)
+            if query_count:
+                common += count if count < query_count else query_count
+        return max_ratio_score(common, total_length) >= threshold
+
+    def filter(self, processed_query: str, threshold: float,
+               positions: Optional[Iterable[int]] = None) -> List[int]:
+        """
+        Get the names that can still score at least threshold against the query.
+
+        Args:
+            processed_query (str): The query, processed like the names
+            threshold (float): Minimum score (0-100)
+            positions (iterable, optional): Only consider these names (indexes into processed_names),
+                                            e.g. an n-gram shortlist. Defaults to every name.
+
+        Returns:
+            list: Indexes of the remaining names, in ascending (map) order
+        """
+        if threshold <= 0:
+            # Every name can reach it
+            return sorted(positions) if positions is not None else list(range(len(self.processed_names)))
+        query_length = len(processed_query)
+        query_counts = Counter(processed_query)
+        survivors = []
+        if positions is None:
+            for length, bucket in self.buckets.items():
+                total_length = length + query_length
+                if max_ratio_score(min(length, query_length), total_length) < threshold:
+                    continue
+                survivors.extend(idx for idx in bucket
+                                 if self._passes_char_bound(idx, query_counts, total_length, threshold))
+            survivors.sort()
+            return survivors
+        for idx in positions:
+            length = len(self.processed_names[idx])
+            total_length = length + query_length
+            if max_ratio_score(min(length, query_length), total_length) < threshold:
+                continue
+            if self._passes_char_bound(idx, query_counts, total_length, threshold):
+                survivors.append(idx)
+        survivors.sort()
+        return survivors
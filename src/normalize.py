@@ -0,0 +1,174 @@
+"""
+Normalization of drug names, used to match names that only differ by punctuation,
+whitespace, salt, hydrate or ester suffixes, dosage forms and strengths, or parenthesized
+abbreviations, and to split combination products ("amoxicillin + clavulanic acid") into
+their components.
+"""
+
+import re
+from typing import Dict, List, Optional, Tuple
+
+# Salt and counter-ion words stripped from the end of a drug name, e.g. "morphine sulfate"
+SALT_SUFFIXES = {
+    'acetate', 'besilate', 'besylate', 'bitartrate', 'bromide', 'calcium', 'chloride',
+    'citrate', 'dihydrochloride', 'dipropionate', 'disodium', 'fumarate', 'gluconate',
+    'hcl', 'hyclate', 'hydrobromide', 'hydrochloride', 'lactate', 'magnesium', 'maleate',
+    'mesilate', 'mesylate', 'nitrate', 'phosphate', 'potassium', 'propionate', 'sodium',
+    'succinate', 'sulfate', 'sulphate', 'tartrate', 'tosylate', 'valerate',
+    # Hydrates
+    'anhydrous', 'dihydrate', 'hemihydrate', 'hydrate', 'monohydrate', 'sesquihydrate', 'trihydrate',
+    # Esters
+    'acetonide', 'benzoate', 'butyrate', 'cipionate', 'cypionate', 'decanoate', 'enanthate',
+    'furoate', 'hexanoate', 'palmitate', 'pivalate', 'stearate', 'undecanoate',
+}
+
+# Dosage-form words and dangling connectors stripped from the end of a drug name, e.g. "insulin injection"
+DOSAGE_FORM_WORDS = {
+    'and', 'capsule', 'capsules', 'cream', 'drops', 'elixir', 'for', 'gel', 'granules', 'inhalation',
+    'inhaler', 'injectable', 'injection', 'infusion', 'lotion', 'ointment', 'or', 'oral', 'patch',
+    'powder', 'solution', 'spray', 'suppository', 'suspension', 'syrup', 'tablet', 'tablets', 'with',
+}
+
+# Separators between the components of a combination product
+_COMBINATION_SEPARATOR = re.compile(r"\s*\+\s*|\s+/\s+|/|\s+with\s+")
+# Strengths such as "500 mg", "0.5%" or "250 mg/5 ml"
+_STRENGTH = re.compile(
+    r"\b\d+(?:[.,]\d+)?\s*(?:mg|mcg|µg|g|ml|iu|units?|%)(?:\s*/\s*\d*(?:[.,]\d+)?\s*(?:mg|mcg|g|ml|l|dose))?(?!\w)")
+
+_PARENTHESIZED = re.compile(r"\([^)]*\)|\[[^\]]*\]")
+_NON_ALPHANUMERIC = re.compile(r"[^0-9a-z]+")
+
+def _strip_trailing(tokens: List[str], words: set) -> List[str]:
+    """Pop tokens in words off the end of tokens, keeping at least one token."""
+    while len(tokens) > 1 and tokens[-1] in words:
+        tokens.pop()
+    return tokens
+
+def _clean_tokens(name: str) -> List[str]:
+    """Lowercase a name, drop parenthesized text and strengths, and split it into alphanumeric tokens."""
+    name = _STRENGTH.sub(" ", _PARENTHESIZED.sub(" ", name.lower()))
+    return _strip_trailing(_NON_ALPHANUMERIC.sub(" ", name).split(), DOSAGE_FORM_WORDS)
+
+def clean_drug_name(name: str) -> str:
+    """
+    Clean a drug name without reducing it to its base: lowercase it, drop parenthesized
+    abbreviations such as "(ABC)" and strengths such as "500 mg", replace punctuation with
+    spaces, collapse whitespace and strip trailing dosage-form words such as "injection".
+
+    Args:
+        name (str): The drug name to clean
+
+    Returns:
+        str: The cleaned drug name, e.g. "morphine sulfate" for "Morphine sulfate 10 mg injection"
+    """
+    return " ".join(_clean_tokens(name))
+
+def normalize_drug_name(name: str) -> str:
+    """
+    Normalize a drug name to its base: clean it (see clean_drug_name) and strip trailing salt,
+    hydrate and ester suffixes. A name is never reduced to nothing, so "sodium chloride" becomes "sodium".
+
+    Args:
+        name (str): The drug name to normalize
+
+    Returns:
+        str: The normalized drug name
+    """
+    tokens = _clean_tokens(name)
+    while len(tokens) > 1 and tokens[-1] in SALT_SUFFIXES | DOSAGE_FORM_WORDS:
+        tokens.pop()
+    return " ".join(tokens)
+
+def base_drug_name(name: str) -> str:
+    """
+    Normalize a drug name to its base (see normalize_drug_name), or return "" if all that is left of it
+    is a counter-ion, so that "sodium lactate" is not taken for any other sodium salt.
+    """
+    base = normalize_drug_name(name)
+    return "" if base in SALT_SUFFIXES else base
+
+def normalized_index_key(name: str) -> str:
+    """
+    Get the key of a drug name in the normalized index (see build_normalized_index): its normalized
+    form, or "" if stripping salt words left only a counter-ion, so that "sodium lactate" is not taken
+    for "sodium chloride". A name that is itself a counter-ion, such as "Calcium (Ca)", keeps its key.
+    """
+    tokens = _clean_tokens(name)
+    normalized_name = normalize_drug_name(name)
+    if normalized_name in SALT_SUFFIXES and len(tokens) > 1:
+        return ""
+    return normalized_name
+
+def split_combination(name: str) -> List[str]:
+    """
+    Split a combination product into its components, e.g. "amoxicillin + clavulanic acid" or
+    "glucose with sodium chloride". Strengths are removed first, so "250 mg/5 ml" is not split.
+
+    Args:
+        name (str): The drug name to split
+
+    Returns:
+        list: The non-empty components, as written. A single element for a single drug.
+    """
+    name = _STRENGTH.sub(" ", _PARENTHESIZED.sub(" ", name.lower()))
+    components = [component.strip() for component in _COMBINATION_SEPARATOR.split(name)]
+    return [component for component in components if _NON_ALPHANUMERIC.sub("", component)]
+
+def build_normalized_index(drug_map: Dict[str, str]) -> Dict[str, str]:
+    """
+    Build an index from normalized drug name (see normalized_index_key) to the drug name it came from.
+    When several names normalize to the same key, a name that is already in normalized
+    form wins; otherwise the first name in map order wins. Salts such as "calcium chloride"
+    are not indexed under their counter-ion.
+
+    Args:
+        drug_map (dict): Dictionary mapping drug names to drugbank ids
+
+    Returns:
+        dict: A dictionary mapping normalized drug names to drug names in drug_map
+    """
+    normalized_index = {}
+    for drug_name in drug_map.keys():
+        normalized_name = normalized_index_key(drug_name)
+        if not normalized_name:
+            continue
+        if normalized_name not in normalized_index or normalized_name == drug_name:
+            normalized_index[normalized_name] = drug_name
+    return normalized_index
+
+def build_base_name_index(drug_map: Dict[str, str],
+                          alias_index: Optional[Dict[str, List[Tuple[str, str]]]] = None) -> Dict[str, List[Tuple[str, str]]]:
+    """
+    Build an index from the lowercased, cleaned and base forms (see base_drug_name) of every drug name
+    and synonym to the drugs they name. Names are listed under a key in that order, e.g. the drug named
+    "acetate" before "[methyltelluro]acetate" and "barium sulfate" before the drugs that reduce to "barium".
+
+    Args:
+        drug_map (dict): Dictionary mapping drug names to drugbank ids
+        alias_index (dict, optional): Alias index (see generate_map.build_drugbank_maps). Its synonyms are
+                                      indexed too, under the primary name of the drug they belong to.
+
+    Returns:
+        dict: A dictionary mapping each key to a list of unique (drug_name, drugbank_id) tuples,
+              drug_name being a key of drug_map
+    """
+    primary_names = {}
+    for drug_name, drugbank_id in drug_map.items():
+        primary_names.setdefault(drugbank_id, drug_name)
+    names = [(drug_name, drug_name, drugbank_id) for drug_name, drugbank_id in drug_map.items()]
+    if alias_index is not None:
+        for alias, entries in alias_index.items():
+            for drugbank_id, alias_type in entries:
+                if alias_type == 'synonym' and drugbank_id in primary_names:
+                    names.append((alias, primary_names[drugbank_id], drugbank_id))
+
+    base_name_index = {}
+    for form in (lambda name: name.lower().strip(), clean_drug_name, base_drug_name):
+        for name, drug_name, drugbank_id in names:
+            key = form(name)
+            if not key:
+                continue
+            entries = base_name_index.setdefault(key, [])
+            if (drug_name, drugbank_id) not in entries:
+                entries.append((drug_name, drugbank_id))
+    return base_name_index
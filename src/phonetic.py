@@ -0,0 +1,209 @@
+"""
+Phonetic keys for drug names, used to find sound-alike names (e.g. dictation errors such as
+"fenobarbital" for "phenobarbital" or "sefalexin" for "cefalexin").
+
+The encoding follows Double Metaphone: consonant sounds are mapped to a reduced alphabet,
+vowels are dropped after the first letter and each word gets a primary and an alternate key
+for its ambiguous sounds. It is tuned for drug nomenclature rather than surnames: "ch" before
+l or r is hard (chlorambucil, chromium), "ae"/"oe" read as "e" (haematin, oestradiol) and an
+initial "x" sounds like "z" (xylometazoline).
+"""
+
+import hashlib
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+from loguru import logger
+from bk_tree import BKTree
+
+VOWELS = set("aeiouy")
+
+# Silent or simplified word beginnings
+_INITIAL_REWRITES = [('ae', 'e'), ('oe', 'e'), ('pn', 'n'), ('ps', 's'), ('pt', 't'), ('kn', 'n'),
+                     ('gn', 'n'), ('mn', 'n'), ('wr', 'r'), ('x', 's')]
+_DIGRAPHS = re.compile(r"ae|oe")
+# Runs of letters are encoded, runs of digits are kept as they are
+_LETTERS_OR_DIGITS = re.compile(r"[a-z]+|[0-9]+")
+# Bump when the encoding changes, so saved indexes built with older keys are rebuilt
+KEY_VERSION = 2
+
+def _encode_word(word: str) -> Tuple[str, str]:
+    """Encode a single lowercase word into its (primary, alternate) phonetic keys."""
+    for prefix, replacement in _INITIAL_REWRITES:
+        if word.startswith(prefix):
+            word = replacement + word[len(prefix):]
+            break
+    word = _DIGRAPHS.sub("e", word)
+    primary, alternate = [], []
+
+    def emit(code: str, alternate_code: Optional[str] = None):
+        primary.append(code)
+        alternate.append(code if alternate_code is None else alternate_code)
+
+    i, length = 0, len(word)
+    while i < length:
+        char = word[i]
+        following = word[i + 1] if i + 1 < length else ""
+        after = word[i + 2] if i + 2 < length else ""
+        # Double letters sound like one, except "cc" as in "succinate"
+        if i > 0 and char == word[i - 1] and char != 'c':
+            i += 1
+            continue
+        step = 1
+        if char in VOWELS:
+            if i == 0:
+                emit("A")
+        elif char == 'b':
+            if not (i == length - 1 and word[i - 1:i] == 'm'):
+                emit("P")
+        elif char == 'c':
+            if following == 'h':
+                if after in ('l', 'r'):
+                    emit("K")
+                else:
+                    emit("X", "K")
+                step = 2
+            elif following in ('e', 'i', 'y'):
+                emit("S")
+            elif following == 'c' and after in ('e', 'i', 'y'):
+                emit("KS")
+                step = 2
+            else:
+                emit("K")
+                if following in ('k', 'q'):
+                    step = 2
+        elif char == 'd':
+            if following == 'g' and after in ('e', 'i', 'y'):
+                emit("J")
+                step = 2
+            else:
+                emit("T")
+        elif char == 'g':
+            if following == 'h':
+                if i == 0:
+                    emit("K")
+                step = 2
+            elif following == 'n':
+                emit("N")
+                step = 2
+            elif following in ('e', 'i', 'y'):
+                emit("J", "K")
+            else:
+                emit("K")
+        elif char == 'h':
+            if (i == 0 or word[i - 1] in VOWELS) and following in VOWELS:
+                emit("H")
+        elif char == 'p':
+            if following == 'h':
+                emit("F")
+                step = 2
+            else:
+                emit("P")
+        elif char == 's':
+            if following == 'h':
+                emit("X")
+                step = 2
+            elif following == 'c' and after == 'h':
+                emit("SK")
+                step = 3
+            else:
+                emit("S")
+        elif char == 't':
+            if following == 'h':
+                emit("0", "T")
+                step = 2
+            elif following == 'i' and after in ('a', 'o'):
+                emit("X")
+            else:
+                emit("T")
+        elif char == 'w':
+            if following in VOWELS:
+                emit("W")
+        elif char == 'x':
+            emit("KS")
+        elif char in ('q', 'k'):
+            emit("K")
+        elif char in ('v', 'f'):
+            emit("F")
+        elif char in ('z', 's'):
+            emit("S")
+        else:
+            emit(char.upper())
+        i += step
+    return _collapse("".join(primary)), _collapse("".join(alternate))
+
+def _collapse(key: str) -> str:
+    """Collapse runs of the same code, e.g. the "KK" of "ck"."""
+    return "".join(code for idx, code in enumerate(key) if idx == 0 or code != key[idx - 1])
+
+def phonetic_keys(name: str) -> Tuple[str, str]:
+    """
+    Get the phonetic keys of a drug name. Each word is encoded separately and the word keys are
+    joined with spaces, so multi-word names keep their word boundaries. Digits are kept verbatim as
+    words of their own, so code names such as "snx-2112" do not reduce to the key of "xanax".
+
+    Args:
+        name (str): The drug name
+
+    Returns:
+        tuple: (primary, alternate) keys. They are equal when the name has no ambiguous sounds.
+    """
+    words = _LETTERS_OR_DIGITS.findall(name.lower())
+    encoded = [(word, word) if word.isdigit() else _encode_word(word) for word in words]
+    return (" ".join(primary for primary, _ in encoded if primary),
+            " ".join(alternate for _, alternate in encoded if alternate))
+
+def names_digest(names: Iterable[str]) -> str:
+    """Hash a set of drug names, independently of their order."""
+    digest = hashlib.sha1()
+    for name in sorted(names):
+        digest.update(name.encode('utf-8') + b'\0')
+    return digest.hexdigest()
+
+class PhoneticIndex:
+    """
+    Drug names grouped by phonetic key, with a BK-tree over the keys. Sound-alike candidates of a
+    query are the names whose key is within a small edit distance of the query's key, so only
+    those are scored. Built once with the map (see generate_map) and pickled alongside it.
+    """
+
+    def __init__(self, drug_map: Dict[str, str]):
+        """
+        Args:
+            drug_map (dict): Dictionary mapping drug names to drugbank ids
+        """
+        self.names_by_key: Dict[str, List[str]] = {}
+        for drug_name in drug_map.keys():
+            for key in set(phonetic_keys(drug_name)):
+                if key:
+                    self.names_by_key.setdefault(key, []).append(drug_name)
+        self.key_tree = BKTree(self.names_by_key)
+        self.names_digest = names_digest(drug_map.keys())
+        self.key_version = KEY_VERSION
+        logger.info(f"Built phonetic index with {len(self.names_by_key)} keys over {len(drug_map)} names")
+
+    def is_built_from(self, drug_map: Dict[str, str]) -> bool:
+        """Check whether the index was built over exactly the names of drug_map, with the current keys."""
+        return (getattr(self, 'key_version', 1) == KEY_VERSION
+                and names_digest(drug_map.keys()) == self.names_digest)
+
+    def candidates(self, query: str, max_distance: int) -> Dict[str, Tuple[str, str, int]]:
+        """
+        Find the names whose phonetic key is within max_distance edits of one of the query's keys.
+
+        Args:
+            query (str): The drug name to search for
+            max_distance (int): Maximum edit distance between phonetic keys
+
+        Returns:
+            dict: Maps each candidate name to (query key, name key, distance) for its closest key
+        """
+        candidates = {}
+        for query_key in set(phonetic_keys(query)):
+            if not query_key:
+                continue
+            for key, distance in self.key_tree.search(query_key, max_distance):
+                for drug_name in self.names_by_key[key]:
+                    best = candidates.get(drug_name)
+                    if best is None or distance < best[2]:
+                        candidates[drug_name] = (query_key, key, distance)
+        return candidates
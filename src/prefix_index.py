@@ -0,0 +1,78 @@
+"""
+Prefix completion over drug names, for type-ahead lookups.
+"""
+
+import heapq
+from bisect import bisect_left
+from typing import Dict, List, Optional, Tuple
+from loguru import logger
+
+class PrefixIndex:
+    """
+    Sorted array of drug names. The names starting with a prefix form one contiguous range,
+    found with two binary searches; the best completions in that range are picked with a
+    precomputed rank.
+    """
+
+    def __init__(self, drug_map: Dict[str, str],
+                 popularity: Optional[Dict[str, float]] = None,
+                 cache_prefix_length: int = 2):
+        """
+        Args:
+            drug_map (dict): Dictionary mapping drug names to drugbank ids
+            popularity (dict, optional): Score of each drug name, higher is better. Names without a score
+                                         count as 0. Ties (and every name, if not provided) are ranked
+                                         shortest first, then alphabetically.
+            cache_prefix_length (int): Completions of prefixes up to this length, whose ranges span
+                                       many names, are cached after the first request
+        """
+        popularity = popularity or {}
+        self.names = sorted(drug_map.keys())
+        self.ids = [drug_map[drug_name] for drug_name in self.names]
+        ranked = sorted(range(len(self.names)),
+                        key=lambda idx: (-popularity.get(self.names[idx], 0.0), len(self.names[idx]), self.names[idx]))
+        # rank[idx] is the position of names[idx] in the ranking, lower is better
+        self.rank = [0] * len(self.names)
+        for position, idx in enumerate(ranked):
+            self.rank[idx] = position
+        self.cache_prefix_length = cache_prefix_length
+        self._cache: Dict[Tuple[str, int], List[Tuple[str, str]]] = {}
+        logger.info(f"Built prefix index over {len(self.names)} names")
+
+    def prefix_range(self, prefix: str) -> Tuple[int, int]:
+        """
+        Get the range of names starting with prefix.
+
+        Returns:
+            tuple: (lo, hi) such that names[lo:hi] are exactly the names starting with prefix
+        """
+        lo = bisect_left(self.names, prefix)
+        if not prefix:
+            return lo, len(self.names)
+        upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+        return lo, bisect_left(self.names, upper, lo)
+
+    def complete(self, prefix: str, k: int = 10) -> List[Tuple[str, str]]:
+        """
+        Get the best-ranked drug names starting with prefix.
+
+        Args:
+            prefix (str): The typed prefix. It is lowercased and stripped of leading whitespace.
+            k (int): Maximum number of completions to return
+
+        Returns:
+            list: (drug_name, drugbank_id) tuples, best first
+        """
+        prefix = prefix.lower().lstrip()
+        cacheable = len(prefix) <= self.cache_prefix_length
+        if cacheable and (prefix, k) in self._cache:
+            return self._cache[(prefix, k)]
+        lo, hi = self.prefix_range(prefix)
+        if hi - lo <= k:
+            best = sorted(range(lo, hi), key=self.rank.__getitem__)
+        else:
+            best = heapq.nsmallest(k, range(lo, hi), key=self.rank.__getitem__)
+        completions = [(self.names[idx], self.ids[idx]) for idx in best]
+        if cacheable:
+            self._cache[(prefix, k)] = completions
+        return completions
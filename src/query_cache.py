@@ -0,0 +1,142 @@
+"""
+Bounded LRU/TTL cache for drug search results.
+"""
+
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+from loguru import logger
+
+def make_cache_key(query: str,
+                   method: str,
+                   threshold: float,
+                   max_results: int,
+                   index_version: str) -> Tuple[str, str, float, int, str]:
+    """
+    Build the cache key of a search. The query is lowercased and stripped the same way
+    fuzzy_search_drug does, so queries that only differ by case or surrounding whitespace
+    share an entry.
+
+    Args:
+        query (str): The drug name searched for
+        method (str): The matching method
+        threshold (float): Minimum similarity score (0-100)
+        max_results (int): Maximum number of results
+        index_version (str): Identifier of the drug map contents the results came from
+
+    Returns:
+        tuple: (normalized query, method, threshold, max_results, index_version)
+    """
+    return (query.lower().strip(), method, float(threshold), max_results, index_version)
+
+class QueryCache:
+    """
+    Thread-safe least-recently-used cache with an optional time-to-live, keeping
+    hit, miss, eviction and expiration counters.
+    """
+
+    def __init__(self, maxsize: int = 10000, ttl: Optional[float] = None):
+        """
+        Args:
+            maxsize (int): Maximum number of entries. The least recently used entry is evicted beyond it.
+            ttl (float, optional): Seconds an entry stays valid. None keeps entries until evicted.
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, Tuple[Any, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Get a cached value and mark it as recently used.
+
+        Returns:
+            The cached value, or None on a miss (including expired entries)
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, stored_at = entry
+            if self.ttl is not None and time.time() - stored_at > self.ttl:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any, stored_at: Optional[float] = None):
+        """Cache a value, evicting the least recently used entries if the cache is full."""
+        with self._lock:
+            self._entries[key] = (value, time.time() if stored_at is None else stored_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Remove all entries. Counters are kept."""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Returns:
+            dict: size, maxsize, hits, misses, evictions, expirations and hit_rate
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def save(self, filepath: str):
+        """
+        Save the entries (least recently used first) to a pickle file, writing to a temporary
+        file first so an interrupted save never leaves a truncated cache behind.
+        """
+        with self._lock:
+            entries = list(self._entries.items())
+        tmp_path = f"{filepath}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(entries, f)
+        os.replace(tmp_path, filepath)
+        logger.info(f"Saved {len(entries)} cached queries to {filepath}")
+
+    def warm(self, filepath: str) -> int:
+        """
+        Load entries saved with save(). Entries that have outlived the TTL are skipped.
+
+        Returns:
+            int: Number of entries loaded
+        """
+        with open(filepath, 'rb') as f:
+            entries = pickle.load(f)
+        now = time.time()
+        loaded = 0
+        for key, (value, stored_at) in entries:
+            if self.ttl is not None and now - stored_at > self.ttl:
+                continue
+            self.put(key, value, stored_at)
+            loaded += 1
+        logger.info(f"Warmed query cache with {loaded} entries from {filepath}")
+        return loaded
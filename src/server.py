@@ -0,0 +1,267 @@
+"""
+Asyncio HTTP/JSON lookup service over the drug map. Uses only the standard library, so it
+runs locally with no outside services:
+
+    python server.py --port 8080
+    curl 'localhost:8080/search?q=metformin'
+    curl -X POST localhost:8080/search_batch -d '{"queries": ["metformin", "aspirin"]}'
+
+Scoring runs in a worker pool so the event loop never blocks, and identical concurrent
+/search requests are scored only once.
+"""
+
+import argparse
+import asyncio
+import json
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+from loguru import logger
+from fuzzy_search import DrugMatcher, get_drug_matcher, load_alias_index, load_drug_name_map
+from query_cache import make_cache_key
+
+# Matcher used by the scoring functions. Set in the server process for a thread pool, or by
+# _init_worker in each worker process for a process pool.
+_matcher: Optional[DrugMatcher] = None
+
+MAX_BODY_BYTES = 10 * 1024 * 1024
+STATUS_TEXT = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+               413: "Payload Too Large", 414: "URI Too Long", 431: "Request Header Fields Too Large",
+               500: "Internal Server Error"}
+
+def _init_worker(filepath: Optional[str], alias_filepath: Optional[str]):
+    """Load the drug map and build the matcher once per worker process."""
+    global _matcher
+    alias_index = load_alias_index(alias_filepath) if alias_filepath is not None else None
+    _matcher = DrugMatcher(load_drug_name_map(filepath), alias_index=alias_index)
+
+def _search(query: str, method: str, threshold: float, max_results: int) -> List[Tuple[str, str, float]]:
+    return _matcher.search(query, method, threshold, max_results)
+
+def _search_many(queries: List[str], method: str, threshold: float,
+                 max_results: int) -> List[List[Tuple[str, str, float]]]:
+    return _matcher.search_many(queries, method, threshold, max_results)
+
+def _results_to_json(results: List[Tuple[str, str, float]]) -> List[Dict]:
+    return [{"drug_name": drug_name, "drugbank_id": drugbank_id, "score": score}
+            for drug_name, drugbank_id, score in results if drug_name]
+
+class HTTPError(Exception):
+    """Error answered to the client with an HTTP status code."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+class DrugSearchServer:
+    """
+    Serves /search and /search_batch over HTTP/1.1 (with keep-alive), scoring in an executor
+    and coalescing identical in-flight /search requests.
+    """
+
+    def __init__(self, executor: Executor):
+        """
+        Args:
+            executor (Executor): Pool the scoring runs in. Its workers must have a matcher (see _init_worker).
+        """
+        self.executor = executor
+        self._inflight: Dict[Tuple, asyncio.Future] = {}
+        self.coalesced = 0
+
+    async def search(self, query: str, method: str, threshold: float, max_results: int) -> List[Tuple[str, str, float]]:
+        """Score a query in the executor, sharing the result with identical requests already in flight."""
+        key = make_cache_key(query, method, threshold, max_results, "")
+        future = self._inflight.get(key)
+        if future is not None:
+            self.coalesced += 1
+            return await asyncio.shield(future)
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self.executor, _search, query, method, threshold, max_results)
+        self._inflight[key] = future
+        future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(future)
+
+    async def search_batch(self, queries: List[str], method: str, threshold: float,
+                           max_results: int) -> List[List[Tuple[str, str, float]]]:
+        """Score a batch of queries as one executor task."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, _search_many, queries, method, threshold, max_results)
+
+    @staticmethod
+    def _search_params(params: Dict) -> Tuple[str, float, int]:
+        try:
+            method = str(params.get("method", "fuzzywuzzy"))
+            threshold = float(params.get("threshold", 70.0))
+            max_results = int(params.get("max_results", 5))
+        except (TypeError, ValueError) as e:
+            raise HTTPError(400, f"Invalid search parameter: {e}")
+        return method, threshold, max_results
+
+    async def route(self, verb: str, target: str, body: bytes) -> Dict:
+        """Dispatch a request and return the JSON response body."""
+        url = urlsplit(target)
+        if url.path == "/search":
+            if verb != "GET":
+                raise HTTPError(405, "Use GET for /search")
+            params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+            if "q" not in params:
+                raise HTTPError(400, "Missing query parameter q")
+            method, threshold, max_results = self._search_params(params)
+            results = await self.search(params["q"], method, threshold, max_results)
+            return {"query": params["q"], "results": _results_to_json(results)}
+
+        if url.path == "/search_batch":
+            if verb != "POST":
+                raise HTTPError(405, "Use POST for /search_batch")
+            try:
+                payload = json.loads(body or b"{}")
+            except json.JSONDecodeError as e:
+                raise HTTPError(400, f"Invalid JSON body: {e}")
+            queries = payload.get("queries") if isinstance(payload, dict) else None
+            if not isinstance(queries, list) or not all(isinstance(query, str) for query in queries):
+                raise HTTPError(400, "Body must be a JSON object with a list of strings under 'queries'")
+            method, threshold, max_results = self._search_params(payload)
+            results = await self.search_batch(queries, method, threshold, max_results)
+            return {"results": [{"query": query, "results": _results_to_json(query_results)}
+                                for query, query_results in zip(queries, results)]}
+
+        if url.path == "/health":
+            return {"status": "ok", "inflight": len(self._inflight), "coalesced": self.coalesced}
+
+        raise HTTPError(404, f"No route for {url.path}")
+
+    @staticmethod
+    async def _read_head(reader: asyncio.StreamReader) -> Tuple[bytes, Dict[str, str]]:
+        """
+        Read a request line and its headers. The request line is empty if the client closed the connection.
+        Lines longer than the reader's limit are answered with 414 (request line) or 431 (header).
+        """
+        try:
+            request_line = await reader.readline()
+        except (ValueError, asyncio.LimitOverrunError):
+            raise HTTPError(414, "Request line too long")
+        headers = {}
+        if not request_line:
+            return request_line, headers
+        while True:
+            try:
+                line = await reader.readline()
+            except (ValueError, asyncio.LimitOverrunError):
+                raise HTTPError(431, "Header line too long")
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        return request_line, headers
+
+    @staticmethod
+    async def _write_response(writer: asyncio.StreamWriter, status: int, response: Any, keep_alive: bool):
+        payload = json.dumps(response).encode("utf-8")
+        writer.write(
+            f"HTTP/1.1 {status} {STATUS_TEXT[status]}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(payload)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1") + payload)
+        await writer.drain()
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Serve the requests of one connection until the client closes it or asks to."""
+        try:
+            while True:
+                try:
+                    request_line, headers = await self._read_head(reader)
+                except HTTPError as e:
+                    # The rest of the oversized line is unread, so the connection cannot be reused
+                    await self._write_response(writer, e.status, {"error": str(e)}, keep_alive=False)
+                    break
+                if not request_line:
+                    break
+
+                status, response = 200, None
+                try:
+                    parts = request_line.decode("latin-1").split()
+                    if len(parts) != 3:
+                        raise HTTPError(400, "Malformed request line")
+                    verb, target, _ = parts
+                    length = int(headers.get("content-length", 0))
+                    if length > MAX_BODY_BYTES:
+                        raise HTTPError(413, "Request body too large")
+                    body = await reader.readexactly(length) if length else b""
+                    response = await self.route(verb, target, body)
+                except HTTPError as e:
+                    status, response = e.status, {"error": str(e)}
+                except ValueError as e:
+                    status, response = 400, {"error": str(e)}
+                except Exception as e:
+                    logger.exception(f"Error handling {request_line!r}")
+                    status, response = 500, {"error": str(e)}
+
+                keep_alive = (headers.get("connection", "").lower() != "close"
+                              and request_line.rstrip().endswith(b"HTTP/1.1")
+                              and status not in (400, 413))
+                await self._write_response(writer, status, response, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+def make_executor(n_workers: int,
+                  filepath: Optional[str] = None,
+                  alias_filepath: Optional[str] = None) -> Executor:
+    """
+    Create the scoring pool.
+
+    Args:
+        n_workers (int): With 0, a single thread scores with one matcher kept in this process. Otherwise a
+                         pool of n_workers processes, each loading the map once (a .dbidx map is shared
+                         between them through the page cache).
+        filepath (str, optional): Path to the drug map file. If None, the most recent one is used.
+        alias_filepath (str, optional): Path to an alias index pickle file
+
+    Returns:
+        Executor: The pool
+    """
+    global _matcher
+    if n_workers <= 0:
+        matcher = get_drug_matcher(filepath)
+        if alias_filepath is not None:
+            matcher = DrugMatcher(matcher.drug_map, alias_index=load_alias_index(alias_filepath))
+        _matcher = matcher
+        return ThreadPoolExecutor(max_workers=1)
+    return ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker,
+                               initargs=(filepath, alias_filepath))
+
+async def serve(host: str = "127.0.0.1", port: int = 8080, n_workers: int = 0,
+                filepath: Optional[str] = None, alias_filepath: Optional[str] = None):
+    """
+    Run the lookup service until cancelled.
+
+    Args:
+        host (str): Interface to listen on
+        port (int): Port to listen on
+        n_workers (int): Scoring pool size, see make_executor
+        filepath (str, optional): Path to the drug map file
+        alias_filepath (str, optional): Path to an alias index pickle file
+    """
+    executor = make_executor(n_workers, filepath, alias_filepath)
+    app = DrugSearchServer(executor)
+    server = await asyncio.start_server(app.handle_connection, host, port)
+    logger.info(f"Serving drug lookups on http://{host}:{port}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="HTTP/JSON drug name lookup service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=0,
+                        help="Number of scoring processes. 0 scores in a thread with one in-memory matcher.")
+    parser.add_argument("--map", dest="filepath", default=None, help="Path to the drug map (.pkl or .dbidx)")
+    parser.add_argument("--aliases", dest="alias_filepath", default=None, help="Path to the alias index pickle")
+    args = parser.parse_args()
+    asyncio.run(serve(args.host, args.port, args.workers, args.filepath, args.alias_filepath))
@@ -0,0 +1,141 @@
+"""
+Disk-backed drug name search through SQLite, for services that cannot hold the drug map in
+memory in every worker.
+
+The database has one row per drug name and alias and an FTS5 table with the trigram tokenizer
+over them. A query shortlists the names sharing the most trigrams with it (ranked by bm25), and
+only the shortlist is scored in Python. The file is opened read-only and memory-mapped, so every
+process searching it shares its pages through the OS page cache.
+
+Schema:
+    names(id INTEGER PRIMARY KEY, name TEXT, drugbank_id TEXT, alias_type TEXT)
+    names_fts  FTS5(name, tokenize='trigram'), external content table over names
+"""
+
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from loguru import logger
+
+EXTENSION = '.sqlite'
+FORMAT_VERSION = 1
+# Bytes of the database file SQLite reads through mmap instead of read() calls
+DEFAULT_MMAP_SIZE = 1 << 30
+
+def write_sqlite_index(name_to_id: Dict[str, str],
+                       filepath: str,
+                       alias_index: Optional[Dict[str, List[Tuple[str, str]]]] = None):
+    """
+    Write the SQLite search database.
+
+    Args:
+        name_to_id (dict): Dictionary mapping drug names to drugbank ids
+        filepath (str): Path of the database to write. An existing file is overwritten.
+        alias_index (dict, optional): Alias index (see generate_map.build_drugbank_maps). If provided,
+                                      every alias is searchable too.
+    """
+    rows = [(name, drugbank_id, 'name') for name, drugbank_id in name_to_id.items()]
+    if alias_index is not None:
+        indexed = set(name_to_id.items())
+        for alias, entries in alias_index.items():
+            for drugbank_id, alias_type in entries:
+                if (alias, drugbank_id) not in indexed:
+                    indexed.add((alias, drugbank_id))
+                    rows.append((alias, drugbank_id, alias_type))
+
+    if os.path.exists(filepath):
+        os.remove(filepath)
+    connection = sqlite3.connect(filepath)
+    try:
+        connection.execute("PRAGMA journal_mode = OFF")
+        connection.execute("PRAGMA synchronous = OFF")
+        connection.execute(f"PRAGMA user_version = {FORMAT_VERSION}")
+        connection.execute("CREATE TABLE names (id INTEGER PRIMARY KEY, name TEXT NOT NULL, "
+                           "drugbank_id TEXT NOT NULL, alias_type TEXT NOT NULL)")
+        connection.execute("CREATE VIRTUAL TABLE names_fts USING fts5(name, tokenize='trigram', "
+                           "content='names', content_rowid='id')")
+        connection.executemany("INSERT INTO names (name, drugbank_id, alias_type) VALUES (?, ?, ?)", rows)
+        connection.execute("INSERT INTO names_fts (names_fts) VALUES ('rebuild')")
+        connection.execute("INSERT INTO names_fts (names_fts) VALUES ('optimize')")
+        connection.commit()
+        connection.execute("VACUUM")
+    finally:
+        connection.close()
+    logger.info(f"Wrote SQLite index with {len(rows)} names and aliases to {filepath}")
+
+def _trigram_query(text: str) -> str:
+    """FTS5 query matching any of the trigrams of text, each quoted as a string."""
+    trigrams = dict.fromkeys(text[i:i + 3] for i in range(len(text) - 2))
+    return " OR ".join('"' + trigram.replace('"', '""') + '"' for trigram in trigrams)
+
+def _escape_like(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+class SqliteDrugIndex:
+    """
+    Read-only handle on a database written by write_sqlite_index. One instance can be shared by
+    every thread of a process: each thread gets its own connection on first use.
+    """
+
+    def __init__(self, filepath: str, mmap_size: int = DEFAULT_MMAP_SIZE):
+        """
+        Args:
+            filepath (str): Path to a file written by write_sqlite_index
+            mmap_size (int): Maximum number of bytes of the file to memory-map
+        """
+        if not os.path.exists(filepath):
+            raise FileNotFoundError(f"No SQLite index at {filepath}")
+        self.filepath = filepath
+        self.mmap_size = mmap_size
+        self._uri = f"{Path(filepath).resolve().as_uri()}?mode=ro"
+        self._local = threading.local()
+        version = self.connection().execute("PRAGMA user_version").fetchone()[0]
+        if version != FORMAT_VERSION:
+            raise ValueError(f"{filepath} has format version {version}, expected {FORMAT_VERSION}")
+
+    def connection(self) -> sqlite3.Connection:
+        """Get the calling thread's read-only connection, opening it on first use."""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self._uri, uri=True)
+            connection.execute(f"PRAGMA mmap_size = {int(self.mmap_size)}")
+            connection.execute("PRAGMA query_only = ON")
+            self._local.connection = connection
+        return connection
+
+    def close(self):
+        """Close the calling thread's connection. It is reopened by the next search from this thread."""
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+    def candidates(self, query: str, max_candidates: int = 200) -> List[Tuple[str, str]]:
+        """
+        Shortlist the names and aliases that share the most trigrams with a query.
+
+        Args:
+            query (str): The lowercased drug name to search for
+            max_candidates (int): Maximum number of names to return
+
+        Returns:
+            list: (name, drugbank_id) tuples, best bm25 rank first. Queries shorter than a
+                  trigram are matched as substrings instead.
+        """
+        connection = self.connection()
+        if len(query) < 3:
+            # Too short to have a trigram, fall back to a substring scan of the names
+            rows = connection.execute(
+                "SELECT name, drugbank_id FROM names WHERE name LIKE ? ESCAPE '\\' ORDER BY length(name), id LIMIT ?",
+                (f"%{_escape_like(query)}%", max_candidates))
+            return rows.fetchall()
+        rows = connection.execute(
+            "SELECT names.name, names.drugbank_id FROM names_fts JOIN names ON names.id = names_fts.rowid "
+            "WHERE names_fts MATCH ? ORDER BY names_fts.rank LIMIT ?",
+            (_trigram_query(query), max_candidates))
+        return rows.fetchall()
+
+    def __len__(self) -> int:
+        return self.connection().execute("SELECT count(*) FROM names").fetchone()[0]
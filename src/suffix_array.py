@@ -0,0 +1,80 @@
+"""
+Generalized suffix array over drug names, for substring search.
+"""
+
+from array import array
+from bisect import bisect_left
+from typing import Iterator, List, Sequence, Tuple
+from loguru import logger
+
+class SuffixArray:
+    """
+    Sorted array of every suffix of every drug name. The suffixes starting with a substring q
+    form one contiguous range, so the names containing q are found with two binary searches,
+    i.e. O(|q| log N) character comparisons.
+
+    Suffixes are stored as (name index, offset) pairs in two compact arrays rather than as strings.
+    """
+
+    def __init__(self, names: Sequence[str]):
+        """
+        Args:
+            names (sequence): The drug names to index
+        """
+        self.names = list(names)
+        suffixes = sorted(((idx, offset) for idx, name in enumerate(self.names) for offset in range(len(name))),
+                          key=lambda suffix: self.names[suffix[0]][suffix[1]:])
+        self.name_idx = array('I', (idx for idx, _ in suffixes))
+        self.offsets = array('I', (offset for _, offset in suffixes))
+        logger.info(f"Built suffix array with {len(self.offsets)} suffixes over {len(self.names)} names")
+
+    def _suffix(self, position: int) -> str:
+        return self.names[self.name_idx[position]][self.offsets[position]:]
+
+    def suffix_range(self, substring: str) -> Tuple[int, int]:
+        """
+        Get the range of suffix array positions whose suffixes start with substring.
+
+        Returns:
+            tuple: (lo, hi) such that positions lo to hi - 1 are exactly the suffixes starting with substring
+        """
+        positions = range(len(self.offsets))
+        lo = bisect_left(positions, substring, key=self._suffix)
+        if not substring:
+            return lo, len(self.offsets)
+        upper = substring[:-1] + chr(ord(substring[-1]) + 1)
+        return lo, bisect_left(positions, upper, lo, key=self._suffix)
+
+    def iter_matches(self, substring: str) -> Iterator[int]:
+        """
+        Lazily yield the index of each name containing substring, once per name, in suffix order.
+        Useful for very short substrings that hit thousands of names, when only the first few are needed.
+
+        Args:
+            substring (str): The substring to look for
+
+        Yields:
+            int: Index (into names) of a name containing substring
+        """
+        if not substring:
+            yield from range(len(self.names))
+            return
+        lo, hi = self.suffix_range(substring)
+        seen = set()
+        for position in range(lo, hi):
+            idx = self.name_idx[position]
+            if idx not in seen:
+                seen.add(idx)
+                yield idx
+
+    def matches(self, substring: str) -> List[int]:
+        """
+        Get the indexes of the names containing substring.
+
+        Args:
+            substring (str): The substring to look for
+
+        Returns:
+            list: Indexes (into names) of the names containing substring, in ascending order
+        """
+        return sorted(self.iter_matches(substring))
@@ -4,10 +4,12 @@ Parses the WHO essential medicines list and returns a list of drug names and dru
 
 import os
 import pandas as pd
-from fuzzy_search import fuzzy_search_drug, load_drug_name_map
+from fuzzy_search import (fuzzy_search_drug, fuzzy_search_many, load_drug_name_map, load_base_name_index,
+                          base_name_matches, DrugMatcher, RAPIDFUZZ_AVAILABLE)
+from normalize import build_base_name_index
+from batch_match import parallel_search_many
 from generate_map import get_src_dir
-from typing import List, Dict, Tuple
-from tqdm import tqdm
+from typing import List, Dict, Tuple, Optional
 from loguru import logger
 
 def parse_who_essential_medicines(filepath: str = None) -> List[str]:
@@ -18,18 +20,62 @@ def parse_who_essential_medicines(filepath: str = None) -> List[str]:
         lines = f.readlines()
     return lines
 
-def get_closest_match(drug_name: str, drug_map: Dict[str, str]) -> Tuple[str, str, float]:
+def combine_matches(results: List[Tuple[str, str, float]]) -> Tuple[str, str, float]:
+    """
+    Combine the per-component matches of a combination product into one row: names joined with " + ",
+    drugbank ids joined with ";" and the lowest score.
+    """
+    return (" + ".join(result[0] for result in results),
+            ";".join(result[1] for result in results),
+            min(result[2] for result in results))
+
+def get_closest_match(drug_name: str, drug_map: Dict[str, str],
+                      matcher: Optional[DrugMatcher] = None,
+                      base_name_index: Optional[Dict[str, List[Tuple[str, str]]]] = None) -> Tuple[str, str, float]:
+    if matcher is not None:
+        base_name_index = matcher.base_name_index
+    if base_name_index is not None:
+        results = base_name_matches(drug_name.lower().strip(), base_name_index, max_results=1)
+        if results:
+            return combine_matches(results)
+    if matcher is not None:
+        return matcher.search(drug_name, method="fuzzywuzzy")[0]
     return fuzzy_search_drug(drug_name, drug_map, method="fuzzywuzzy")[0]
 
-def main():
-    drug_map = load_drug_name_map()
+def main(n_workers: Optional[int] = None):
     who_essential_medicines = parse_who_essential_medicines()
 
+    drug_map = load_drug_name_map()
+    try:
+        base_name_index = load_base_name_index()
+    except FileNotFoundError:
+        logger.warning("No saved base-name index, building one from the drug map")
+        base_name_index = build_base_name_index(drug_map)
+
+    # Salt forms, dosage forms and combination products resolve through the base-name index,
+    # only the remaining names need fuzzy matching
+    logger.info("Matching base names")
+    closest = {}
+    for idx, drug_name in enumerate(who_essential_medicines):
+        results = base_name_matches(drug_name.lower().strip(), base_name_index, max_results=1)
+        if results:
+            closest[idx] = combine_matches(results)
+    remaining = [idx for idx in range(len(who_essential_medicines)) if idx not in closest]
+    logger.info(f"Matched {len(closest)} names by base name, fuzzy matching {len(remaining)}")
+
     # Collect all data
     logger.info("Getting closest matches")
+    remaining_names = [who_essential_medicines[idx] for idx in remaining]
+    if RAPIDFUZZ_AVAILABLE:
+        # Bulk native scoring already uses every core
+        matches = fuzzy_search_many(remaining_names, drug_map, workers=n_workers if n_workers else -1)
+    else:
+        matches = parallel_search_many(remaining_names, method="fuzzywuzzy", n_workers=n_workers)
+    for idx, results in zip(remaining, matches):
+        closest[idx] = results[0]
     data = []
-    for drug_name in tqdm(who_essential_medicines):
-        closest_name, drugbank_id, score = get_closest_match(drug_name, drug_map)
+    for idx, drug_name in enumerate(who_essential_medicines):
+        closest_name, drugbank_id, score = closest[idx]
         data.append({
             "drug_name": drug_name,
             "closest_name": closest_name,
@@ -0,0 +1,18 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from bk_tree import max_edit_distance, edit_similarity
+from fuzzy_search import fuzzy_search_drug
+
+def test_max_edit_distance_at_exact_threshold():
+    # 8 characters against 10 at distance 2 score exactly 80
+    assert max_edit_distance('abcdefgh', 80) == 2
+    assert max_edit_distance('abcd', 80) == 1
+    assert max_edit_distance('abcdefghi', 90) == 1
+    assert edit_similarity('abcdefgh', 'abcdefghij', 2) == 80.0
+
+def test_edit_search_keeps_match_scoring_exactly_threshold():
+    results = fuzzy_search_drug('abcdefgh', {'abcdefghij': 'DB1'}, method='edit', threshold=80)
+    assert results == [('abcdefghij', 'DB1', 80.0)]
@@ -0,0 +1,42 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from generate_map import build_drugbank_maps, build_drugbank_maps_incremental
+
+def _write_release(path, version, drugs):
+    entries = "".join(
+        f"<drug><drugbank-id primary=\"true\">{drugbank_id}</drugbank-id><name>{name}</name>"
+        f"<synonyms>{''.join(f'<synonym>{synonym}</synonym>' for synonym in synonyms)}</synonyms></drug>"
+        for drugbank_id, name, synonyms in drugs)
+    path.write_text(f'<?xml version="1.0" encoding="UTF-8"?>'
+                    f'<drugbank xmlns="http://www.drugbank.ca" version="{version}">{entries}</drugbank>')
+    return str(path)
+
+def test_incremental_build_matches_full_build(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'src').mkdir()
+    previous = _write_release(tmp_path / 'old.xml', '5.1.0', [
+        ('DB00001', 'Alpha', ['alfa']),
+        ('DB00002', 'Beta', []),
+        ('DB00005', 'Dup', []),
+        ('DB00006', 'Dup', ['dupe']),
+        ('DB00007', 'Gamma', []),
+    ])
+    current = _write_release(tmp_path / 'new.xml', '5.1.1', [
+        ('DB00001', 'Alpha', ['alfa', 'alpha-1']),
+        ('DB00002', 'Beta 2', []),
+        ('DB00005', 'Dup', []),
+        ('DB00007', 'Gamma', []),
+        ('DB00008', 'Delta', []),
+    ])
+    build_drugbank_maps(previous, save_output=True)
+
+    name_to_id, alias_index, _ = build_drugbank_maps_incremental(current, save_output=False)
+    expected_name_to_id, expected_alias_index = build_drugbank_maps(current, save_output=False)
+
+    assert name_to_id == expected_name_to_id
+    assert name_to_id['dup'] == 'DB00005'
+    assert {alias: sorted(entries) for alias, entries in alias_index.items()} == \
+           {alias: sorted(entries) for alias, entries in expected_alias_index.items()}
@@ -0,0 +1,20 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from fuzzy_search import DrugMatcher, lookup_drug
+from normalize import build_base_name_index, build_normalized_index
+
+DRUG_MAP = {'hydrocortisone': 'DB00741', 'hydrocortisone acetate': 'DB14539', 'sodium chloride': 'DB09153'}
+
+def test_salt_form_is_found_before_salts_are_stripped():
+    results, tier = lookup_drug("Hydrocortisone acetate 1% cream", DRUG_MAP,
+                                normalized_index=build_normalized_index(DRUG_MAP),
+                                base_name_index=build_base_name_index(DRUG_MAP))
+    assert (results, tier) == ([('hydrocortisone acetate', 'DB14539', 100.0)], "base")
+    assert DrugMatcher(DRUG_MAP).lookup("Hydrocortisone acetate 1% cream")[0][0][1] == 'DB14539'
+
+def test_counter_ion_does_not_match_another_salt():
+    results, tier = DrugMatcher(DRUG_MAP).lookup("sodium lactate")
+    assert tier == "fuzzy"